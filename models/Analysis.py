@@ -5,6 +5,15 @@ import plotly.graph_objects as go
 import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
+import os
+
+from src.data import listings
+from src.features.market_cube import DIMENSIONS, METRICS, MarketCube
+from src.features.online_stats import CsvStats
+from src.visualization import render
+
+# Charts above this many rows are aggregated server-side before sending
+MAX_POINTS = int(os.environ.get("GARMANDI_MAX_POINTS", render.MAX_POINTS))
 
 # --- 1. PAGE CONFIG (Consistent with Main Site) ---
 st.set_page_config(page_title="GARMANDI | Market Pulse", layout="wide", initial_sidebar_state="collapsed")
@@ -49,14 +58,33 @@ st.markdown("""
 
 # --- 3. DATA ENGINE ---
 @st.cache_data
-def load_data():
-    df = pd.read_csv('gurgaon_properties_missing_value_imputation.csv', index_col=0)
+def load_data(version):
+    # Typed Parquet copy from `make data` (falls back to the CSV); only the
+    # columns the charts use are read
     num_cols = ['price','price_per_sqft','built_up_area','luxury_score','bedRoom','bathroom']
-    for c in num_cols:
-        df[c] = pd.to_numeric(df[c], errors='coerce')
+    df = listings.load('listings', columns=['sector'] + num_cols)
     return df, num_cols
 
-df, num_cols = load_data()
+LISTINGS_PATH = 'gurgaon_properties_missing_value_imputation.csv'
+
+@st.cache_resource
+def load_cube(version):
+    # Aggregates are rebuilt only when the files listings.load reads (the
+    # Parquet copy, or the CSV without one) change on disk
+    cube = MarketCube.from_frame(listings.load('listings', columns=DIMENSIONS + METRICS))
+    return cube, cube.rollup('sector')
+
+@st.cache_resource
+def load_moments(columns):
+    # Chunked Welford scan over just the numeric columns of the listing;
+    # refresh() folds in appended listings, or rescans a rewritten file
+    return CsvStats(LISTINGS_PATH, columns)
+
+data_version = listings.version('listings')
+df, num_cols = load_data(data_version)
+cube, sector_stats = load_cube(data_version)
+moments = load_moments(tuple(num_cols))
+moments.refresh()
 
 # --- 4. HEADER ---
 st.markdown('<h1 class="analysis-header">MARKET PULSE</h1>', unsafe_allow_html=True)
@@ -66,16 +94,17 @@ st.markdown('<p style="text-align:center; color:#D4AF37; letter-spacing:5px; fon
 with st.container():
     col_f1, col_f2, col_f3, col_f4 = st.columns([1, 1, 1, 1])
     with col_f1:
-        selected_sector = st.selectbox("🎯 TARGET SECTOR", sorted(df['sector'].dropna().unique()))
+        selected_sector = st.selectbox("🎯 TARGET SECTOR", sorted(sector_stats.index.dropna()))
     
-    filtered_df = df[df['sector'] == selected_sector]
+    # Pre-rolled sector totals: a lookup, not a scan of the listing
+    kpi = sector_stats.loc[selected_sector]
     
     with col_f2:
-        st.metric("AVG VALUATION", f"₹{filtered_df['price'].mean():.2f} Cr")
+        st.metric("AVG VALUATION", f"₹{kpi['price_mean']:.2f} Cr")
     with col_f3:
-        st.metric("SQFT ALPHA", f"₹{filtered_df['price_per_sqft'].mean():,.0f}")
+        st.metric("SQFT ALPHA", f"₹{kpi['price_per_sqft_mean']:,.0f}")
     with col_f4:
-        st.metric("LUXURY INDEX", f"{filtered_df['luxury_score'].mean():.1f}/100")
+        st.metric("LUXURY INDEX", f"{kpi['luxury_score_mean']:.1f}/100")
 
 st.markdown("<br>", unsafe_allow_html=True)
 
@@ -100,7 +129,7 @@ with tab1:
     
     with c1:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        sector_avg = df.groupby('sector')['price'].mean().reset_index().sort_values('price', ascending=False).head(15)
+        sector_avg = sector_stats['price_mean'].sort_values(ascending=False).head(15).rename('price').reset_index()
         fig1 = px.bar(sector_avg, x='sector', y='price', title="TOP 15 SECTORS BY VALUATION",
                      color_continuous_scale=['#0a1a15', '#D4AF37'])
         st.plotly_chart(apply_dark_theme(fig1), use_container_width=True)
@@ -108,22 +137,29 @@ with tab1:
 
     with c2:
         st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-        fig2 = px.scatter(df, x='built_up_area', y='price', color='luxury_score',
-                         title="AREA VS PRICE (COLOR: LUXURY SCORE)",
-                         color_continuous_scale='Viridis')
+        fig2 = render.scatter(df, x='built_up_area', y='price', color='luxury_score',
+                              max_points=MAX_POINTS,
+                              title="AREA VS PRICE (COLOR: LUXURY SCORE)",
+                              color_continuous_scale='Viridis')
         st.plotly_chart(apply_dark_theme(fig2), use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
 
+    drill_by = st.multiselect("🔍 DRILL DOWN SECTOR BY", ['property_type', 'bedRoom', 'agePossession'], default=['property_type'])
+    if drill_by:
+        drill = cube.rollup(drill_by, where={'sector': selected_sector})
+        st.dataframe(drill[['price_count', 'price_mean', 'price_std', 'price_per_sqft_mean', 'luxury_score_mean']].round(2),
+                     use_container_width=True)
+
 with tab2:
     st.markdown('<div class="chart-container">', unsafe_allow_html=True)
-    fig4 = px.violin(df, x='bedRoom', y='luxury_score', color='bedRoom', box=True,
-                    title="BEDROOM COUNT VS LUXURY SCORE DISTRIBUTION")
+    fig4 = render.distribution(df, x='bedRoom', y='luxury_score', max_points=MAX_POINTS,
+                               title="BEDROOM COUNT VS LUXURY SCORE DISTRIBUTION")
     st.plotly_chart(apply_dark_theme(fig4), use_container_width=True)
     st.markdown('</div>', unsafe_allow_html=True)
 
 with tab3:
     st.subheader("Neural Connectivity Matrix")
-    corr = df[num_cols].corr()
+    corr = moments.overall.correlation()
     
     fig_corr = go.Figure(data=go.Heatmap(
         z=corr.values,
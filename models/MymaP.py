@@ -2,6 +2,17 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import numpy as np
+import os
+
+from src.data import listings
+from src.features.density import DensityRaster
+from src.features.online_stats import CsvStats
+from src.features.point_store import PointStore, viewport_bounds
+from src.features.spatial_tiles import TilePyramid, zoom_for_bounds
+from src.visualization import render
+
+# Most listing points sent to the raw map per "Load more" page
+MAX_POINTS = int(os.environ.get("GARMANDI_MAX_POINTS", render.MAX_POINTS))
 
 # -----------------------------------
 # PAGE CONFIG
@@ -36,23 +47,52 @@ st.markdown("""
 # DATA LOADING
 # -----------------------------------
 @st.cache_data
-def load_data():
-    df = pd.read_csv('data_viz1.csv', index_col=0) 
-    df_new = pd.read_csv('gurgaon_properties_missing_value_imputation.csv', index_col=0)
+def load_data(sector=None, version=None):
+    # Typed Parquet copy from `make data` (falls back to the CSV); only the
+    # mapped columns and, when filtered, one sector partition are read.
+    # ``version`` changes with the files read, so a rewrite reloads
+    cols = ['sector', 'price', 'price_per_sqft', 'built_up_area', 'latitude', 'longitude']
+    return listings.load('viz', columns=cols, sectors=[sector] if sector else None)
+
+@st.cache_resource
+def load_sector_moments():
+    # Per-sector running moments from a chunked scan of the listing;
+    # refresh() folds in appended listings, or rescans a rewritten file
     cols = ['price', 'price_per_sqft', 'built_up_area', 'latitude', 'longitude']
-    for c in cols:
-        df[c] = pd.to_numeric(df[c], errors='coerce')
-    return df, df_new
+    return CsvStats('data_viz1.csv', cols, by='sector')
 
-df, df_new = load_data()
+moments = load_sector_moments()
+moments.refresh()
 
 # --- SIDEBAR FILTERS (New UI Element) ---
 st.sidebar.markdown("<h2 style='color:#D4AF37; font-family:Cinzel;'>FILTERS</h2>", unsafe_allow_html=True)
-sector_list = ['All'] + sorted(df['sector'].unique().tolist())
+sector_list = ['All'] + sorted(moments.grouped.groups)
 selected_sector = st.sidebar.selectbox("Select Sector", sector_list)
 
+data_version = listings.version('viz')
+df = load_data(None if selected_sector == 'All' else selected_sector, data_version)
+
+@st.cache_resource
+def load_tiles(sector, version):
+    # Quadtree count/price aggregates at every level, built once per filter
+    # and dataset version
+    return TilePyramid.build(load_data(sector, version))
+
+tiles = load_tiles(None if selected_sector == 'All' else selected_sector, data_version)
+map_zoom = st.sidebar.slider("Map Zoom", 8, 16, min(max(zoom_for_bounds(df['latitude'], df['longitude']), 8), 16))
+
+# Every map is centred on the filter and only loads what this view shows
+map_center = dict(lat=df['latitude'].mean(), lon=df['longitude'].mean())
+view = viewport_bounds(map_center['lat'], map_center['lon'], map_zoom)
+
 if selected_sector != 'All':
-    df = df[df['sector'] == selected_sector]
+    selected_moments = moments.grouped.groups[selected_sector]
+else:
+    selected_moments = moments.overall
+sector_means = moments.grouped.frame('mean')
+if selected_sector != 'All':
+    sector_means = sector_means.loc[[selected_sector]]
+kpi = pd.Series(selected_moments.mean, index=selected_moments.columns)
 
 # -----------------------------------
 # PAGE HEADER
@@ -62,11 +102,11 @@ st.markdown('<h1 class="main-title">GEOSPATIAL CORE</h1>', unsafe_allow_html=Tru
 # --- TOP METRICS (New UI Element) ---
 m1, m2, m3 = st.columns(3)
 with m1:
-    st.markdown(f"<div class='metric-card'><p style='color:gray;margin:0;'>TOTAL ASSETS</p><h2 style='color:white;margin:0;'>{len(df)}</h2></div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='metric-card'><p style='color:gray;margin:0;'>TOTAL ASSETS</p><h2 style='color:white;margin:0;'>{selected_moments.n}</h2></div>", unsafe_allow_html=True)
 with m2:
-    st.markdown(f"<div class='metric-card'><p style='color:gray;margin:0;'>AVG. PRICE</p><h2 style='color:#D4AF37;margin:0;'>₹{df['price'].mean():.2f} Cr</h2></div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='metric-card'><p style='color:gray;margin:0;'>AVG. PRICE</p><h2 style='color:#D4AF37;margin:0;'>₹{kpi['price']:.2f} Cr</h2></div>", unsafe_allow_html=True)
 with m3:
-    st.markdown(f"<div class='metric-card'><p style='color:gray;margin:0;'>AVG. SQFT RATE</p><h2 style='color:white;margin:0;'>₹{df['price_per_sqft'].mean():,.0f}</h2></div>", unsafe_allow_html=True)
+    st.markdown(f"<div class='metric-card'><p style='color:gray;margin:0;'>AVG. SQFT RATE</p><h2 style='color:white;margin:0;'>₹{kpi['price_per_sqft']:,.0f}</h2></div>", unsafe_allow_html=True)
 
 st.markdown("<hr style='border: 0.5px solid rgba(212,175,55,0.2);'>", unsafe_allow_html=True)
 
@@ -75,14 +115,13 @@ st.markdown("<hr style='border: 0.5px solid rgba(212,175,55,0.2);'>", unsafe_all
 # -----------------------------------
 st.markdown("### 📊 Average Property Metrics by Sector")
 
-cols_to_group = ['price', 'price_per_sqft', 'built_up_area', 'latitude', 'longitude']
-group_df = df.groupby('sector')[cols_to_group].mean().reset_index()
+group_df = sector_means.reset_index()
 
 fig = px.scatter_mapbox(
     group_df, lat="latitude", lon="longitude",
     color="price_per_sqft", size="built_up_area",
     color_continuous_scale="Viridis", 
-    zoom=10, mapbox_style="carto-darkmatter",
+    zoom=map_zoom, mapbox_style="carto-darkmatter",
     hover_name="sector",
     hover_data={"price": True, "price_per_sqft": True, "built_up_area": True}
 )
@@ -94,12 +133,15 @@ st.plotly_chart(fig, use_container_width=True)
 # -----------------------------------
 st.markdown("### 💰 Property Price Distribution")
 
+# One marker per visible quadtree cell at the level matching the map zoom
+price_cells = tiles.cells(map_zoom, bounds=view)
 fig1 = px.scatter_mapbox(
-    df, lat="latitude", lon="longitude",
-    color="price", size="built_up_area",
+    price_cells, lat="latitude", lon="longitude",
+    color="price", size="count",
     color_continuous_scale="YlOrBr", # FIXED ERROR HERE
-    hover_name="sector", mapbox_style="carto-darkmatter",
-    zoom=10
+    hover_data={"count": True, "price": ':.2f', "price_per_sqft": ':,.0f'},
+    mapbox_style="carto-darkmatter",
+    zoom=map_zoom, center=map_center
 )
 fig1.update_layout(paper_bgcolor='rgba(0,0,0,0)', font_color="white", margin=dict(l=0, r=0, t=0, b=0))
 st.plotly_chart(fig1, use_container_width=True)
@@ -108,13 +150,30 @@ st.plotly_chart(fig1, use_container_width=True)
 # 3️⃣ Heatmap
 # -----------------------------------
 st.markdown("### 🔥 Price Density Heatmap")
-sector_avg = df.groupby('sector')[['price_per_sqft', 'latitude', 'longitude']].mean().reset_index()
 
-fig2 = px.density_mapbox(
-    sector_avg, lat='latitude', lon='longitude', z='price_per_sqft',
-    radius=30, mapbox_style="carto-darkmatter",
-    color_continuous_scale="Inferno", zoom=10
+@st.cache_resource
+def load_density(sector, version):
+    # Listing-level KDE on a fixed grid (binning + FFT convolution), once per
+    # filter and dataset version; every layer is read from the same raster
+    data = load_data(sector, version)
+    return DensityRaster(data['latitude'], data['longitude'], data['price_per_sqft'])
+
+density_layers = {"Listing density": "count", "₹/sqft-weighted density": "weighted", "Local mean ₹/sqft": "mean"}
+density_choice = st.radio("Heatmap layer", list(density_layers), horizontal=True)
+raster = load_density(None if selected_sector == 'All' else selected_sector, data_version)
+
+# The raster goes to the browser as one PNG overlay: no per-point payload
+# and no client-side kernel blending
+density_image, (z_lo, z_hi) = render.raster_image(raster.grid(density_layers[density_choice]))
+fig2 = px.scatter_mapbox(
+    # Two invisible points carry the colour bar for the image layer
+    pd.DataFrame({'latitude': [map_center['lat']] * 2, 'longitude': [map_center['lon']] * 2, 'z': [z_lo, z_hi]}),
+    lat='latitude', lon='longitude', color='z', opacity=0,
+    color_continuous_scale="Inferno", mapbox_style="carto-darkmatter",
+    zoom=map_zoom, center=map_center, labels={'z': density_choice}
 )
+fig2.update_traces(hoverinfo='skip', hovertemplate=None)
+fig2.update_layout(mapbox_layers=[dict(sourcetype='image', source=density_image, coordinates=raster.corners())])
 fig2.update_layout(paper_bgcolor='rgba(0,0,0,0)', font_color="white", margin=dict(l=0, r=0, t=0, b=0))
 st.plotly_chart(fig2, use_container_width=True)
 
@@ -122,7 +181,26 @@ st.plotly_chart(fig2, use_container_width=True)
 # 4️⃣ Raw Map
 # -----------------------------------
 st.markdown("### 🗺️ All Property Locations")
-st.map(df)
+
+@st.cache_resource
+def load_point_store(sector, version):
+    # Grid-bucketed points, price-weighted priority sampling within the view
+    return PointStore(load_data(sector, version), weight='price')
+
+points = load_point_store(None if selected_sector == 'All' else selected_sector, data_version)
+
+# "Load more" pages in the next batch for the same view; a new view (or
+# a rebuilt dataset) starts over
+if st.session_state.get('point_view') != (selected_sector, map_zoom, data_version):
+    st.session_state['point_view'] = (selected_sector, map_zoom, data_version)
+    st.session_state['point_pages'] = 1
+shown = pd.concat([points.query(view, MAX_POINTS, page) for page in range(st.session_state['point_pages'])])
+in_view = points.count(view)
+st.map(shown, latitude='latitude', longitude='longitude', zoom=map_zoom)
+st.caption(f"Showing {len(shown):,} of {in_view:,} listings in view (priority-sampled by price)")
+if len(shown) < in_view and st.button("Load more points"):
+    st.session_state['point_pages'] += 1
+    st.rerun()
 
 # -----------------------------------
 # FOOTER
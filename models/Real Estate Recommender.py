@@ -1,6 +1,8 @@
 import streamlit as st
-import pickle
-import pandas as pd
+import os
+
+from src.models.recommender import DEFAULT_WEIGHTS, SimilarityStore, TopKIndex, stale_names
+from src.models.recommender_faiss import FaissRecommender
 
 # -----------------------------------
 # 1. PAGE CONFIG & GARMANDI THEME
@@ -55,40 +57,64 @@ header, footer {visibility: hidden;}
 # -----------------------------------
 # 2. LOAD RECOMMENDER DATA
 # -----------------------------------
+def store_version():
+    # Incremental updates rewrite manifest.json, so its mtime keys the cache
+    manifest = os.path.join("recommender_store", "manifest.json")
+    return os.path.getmtime(manifest) if os.path.exists(manifest) else None
+
 @st.cache_resource
-def load_recommender_data():
+def load_recommender_data(version=None):
     try:
-        with open("recommender_data.pkl", "rb") as file:
-            return pickle.load(file)
+        # Memory-mapped store from `python -m src.models.recommender build-store`:
+        # rows are paged in on demand and shared by every worker process
+        if os.path.isdir("recommender_store"):
+            return SimilarityStore.open("recommender_store")
+        return SimilarityStore.from_pickle("recommender_data.pkl")
     except Exception as e:
         st.error(f"Engine Offline: {e}")
         return None
 
-data = load_recommender_data()
+@st.cache_resource
+def load_topk_index(version=None):
+    # Compact N·K neighbour lists from `python -m src.models.recommender build-topk`;
+    # re-checked against the store whenever its manifest changes
+    if data is None or not os.path.exists("recommender_topk.npz"):
+        return None, set()
+    index = TopKIndex.load("recommender_topk.npz")
+    stale = stale_names(index.names, data)
+    if stale is None:
+        st.caption("Top-K index predates newly added listings; using the exact store "
+                   "(rebuild with `build-topk --store recommender_store`).")
+        return None, set()
+    return index, stale
+
+@st.cache_resource
+def load_faiss_engine(version=None):
+    # Per-component ANN indexes from `python -m src.models.recommender_faiss build`;
+    # delisted properties are masked, additions need a rebuild
+    if data is None or not os.path.isdir("recommender_faiss"):
+        return None, set()
+    engine = FaissRecommender.load("recommender_faiss")
+    stale = stale_names(engine.names, data)
+    if stale is None:
+        st.caption("FAISS indexes predate newly added listings; using the exact store "
+                   "(rebuild with `recommender_faiss build --store recommender_store`).")
+        return None, set()
+    return engine, stale
+
+data = load_recommender_data(store_version())
+topk_index, topk_removed = load_topk_index(store_version())
+faiss_engine, faiss_removed = load_faiss_engine(store_version())
 
 if data:
-    cosine_sim1 = data["cosine_sim1"]
-    cosine_sim2 = data["cosine_sim2"]
-    cosine_sim3 = data["cosine_sim3"]
-    location_df_normalized = data["location_df_normalized"]
+    location_index = data.active_names()
 
     # -----------------------------------
     # 3. RECOMMENDATION LOGIC
     # -----------------------------------
-    def recommend_properties_with_scores(property_name, top_n=10):
-        cosine_sim_matrix = 30 * cosine_sim1 + 20 * cosine_sim2 + 8 * cosine_sim3
-        idx = location_df_normalized.index.get_loc(property_name)
-        sim_scores = list(enumerate(cosine_sim_matrix[idx]))
-        sorted_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-        
-        top_indices = [i[0] for i in sorted_scores[1:top_n + 1]]
-        top_scores = [i[1] for i in sorted_scores[1:top_n + 1]]
-        top_properties = location_df_normalized.index[top_indices].tolist()
-
-        return pd.DataFrame({
-            'PropertyName': top_properties,
-            'SimilarityScore': [round(score, 3) for score in top_scores]
-        })
+    def recommend_properties_with_scores(property_name, top_n=10, weights=DEFAULT_WEIGHTS):
+        # Only the selected row of each matrix is touched: O(N) per query
+        return data.recommend(property_name, top_n, weights)
 
     # -----------------------------------
     # 4. HEADER & INPUTS
@@ -101,22 +127,57 @@ if data:
     with c1:
         property_name = st.selectbox(
             "🏠 SELECT REFERENCE PROPERTY:",
-            location_df_normalized.index.tolist()
+            location_index.tolist()
         )
     with c2:
         top_n = st.select_slider("🔢 MATCH COUNT", options=range(3, 16), value=5)
 
-    st.markdown("<br>", unsafe_allow_html=True)
-    if st.button("🔎 ANALYZE SIMILAR ASSETS", use_container_width=True):
-        recommendations = recommend_properties_with_scores(property_name, top_n)
+    w1, w2, w3 = st.columns(3)
+    with w1:
+        w_facilities = st.slider("🏊 FACILITIES WEIGHT", 0.0, 50.0, DEFAULT_WEIGHTS[0], step=1.0)
+    with w2:
+        w_price = st.slider("💰 PRICE WEIGHT", 0.0, 50.0, DEFAULT_WEIGHTS[1], step=1.0)
+    with w3:
+        w_location = st.slider("📍 LOCATION WEIGHT", 0.0, 50.0, DEFAULT_WEIGHTS[2], step=1.0)
+    weights = (w_facilities, w_price, w_location)
+
+    # 📦 Portfolio mode: match against a weighted basket of holdings
+    basket_mode = st.toggle("📦 BASKET MODE (MATCH AN EXISTING PORTFOLIO)")
+    if basket_mode:
+        basket = st.multiselect("🏘️ SELECT HOLDINGS:", location_index.tolist(), default=[property_name])
+        bw_cols = st.columns(max(len(basket), 1))
+        basket_weights = [
+            bw_cols[k].number_input(f"⚖️ {name}", 0.0, 100.0, 1.0, step=0.5, key=f"bw_{name}")
+            for k, name in enumerate(basket)
+        ]
 
-        st.markdown(f"### 🎯 Identification Complete: {top_n} Matches for {property_name}")
+    st.markdown("<br>", unsafe_allow_html=True)
+    if st.button("🔎 ANALYZE SIMILAR ASSETS", use_container_width=True, disabled=basket_mode and not basket):
+        if basket_mode:
+            try:
+                recommendations = data.recommend_basket(basket, top_n, weights, basket_weights)
+            except ValueError as e:
+                # All-zero holding weights leave nothing to average
+                st.warning(f"Cannot match this basket: {e}. Give at least one holding a weight above zero.")
+                st.stop()
+            reference = f"a {len(basket)}-asset basket"
+        elif faiss_engine is not None and property_name in faiss_engine.names:
+            recommendations = faiss_engine.recommend(property_name, top_n, weights, removed=faiss_removed)
+            reference = property_name
+        elif topk_index is not None and property_name in topk_index.names:
+            recommendations = topk_index.recommend(property_name, top_n, weights, topk_removed)
+            reference = property_name
+        else:
+            recommendations = recommend_properties_with_scores(property_name, top_n, weights)
+            reference = property_name
+
+        st.markdown(f"### 🎯 Identification Complete: {top_n} Matches for {reference}")
         
         # -----------------------------------
         # 5. DISPLAY AS ELITE TILES
         # -----------------------------------
         for i, row in recommendations.iterrows():
-            match_pct = min(100, int((row['SimilarityScore'] / 58) * 100))
+            match_pct = min(100, int((row['SimilarityScore'] / max(sum(weights), 1e-9)) * 100))
             st.markdown(
                 f"""
                 <div class="asset-card">
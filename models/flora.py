@@ -1,14 +1,11 @@
 import streamlit as st
 import time
 import os
-import pandas as pd
-from PIL import Image
-import pytesseract
 
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_community.vectorstores import FAISS
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from src.data.ingest import DocumentPipeline, iter_csv_texts
+from src.models.knowledge_base import KB_ROOT, KnowledgeBase, content_hash
 
 # -------------------------------------------------
 # SYSTEM CONFIG
@@ -79,23 +76,53 @@ header, footer {visibility: hidden;}
 # -------------------------------------------------
 # HELPERS (UNCHANGED LOGIC)
 # -------------------------------------------------
-def load_csv(file):
-    df = pd.read_csv(file)
-    return [" | ".join(map(str, row.values)) for _, row in df.iterrows()]
-
-def load_pdf(file):
-    loader = PyPDFLoader(file)
-    return [doc.page_content for doc in loader.load()]
-
-def load_image(file):
-    img = Image.open(file)
-    return pytesseract.image_to_string(img)
-
-def create_vectorstore(texts):
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    docs = splitter.create_documents(texts)
-    embeddings = OpenAIEmbeddings()
-    return FAISS.from_documents(docs, embeddings)
+def load_csv(file, progress=None):
+    # Chunked read + vectorised row serialisation, yielded batch by batch
+    for texts, done, rows_per_sec in iter_csv_texts(file):
+        if progress is not None:
+            progress.markdown(
+                f'<p style="color:#D4AF37;font-size:0.6rem;">[ {file.name}: {done:,} ROWS @ {rows_per_sec:,.0f}/s ]</p>',
+                unsafe_allow_html=True
+            )
+        yield texts
+
+@st.cache_resource
+def load_knowledge_base(corpus="default"):
+    # Persistent FAISS index + content-hash embedding cache under flora_kb/,
+    # shared by every session; retrieval goes through session_store()
+    return KnowledgeBase(os.path.join(KB_ROOT, corpus), OpenAIEmbeddings())
+
+@st.cache_resource(max_entries=32)
+def session_store(file_hashes):
+    # Retrieval sees only the current upload set, built from stored vectors
+    return load_knowledge_base().subset(file_hashes)
+
+def ingest_files(kb, files):
+    # Files already in the corpus (by content hash) are not even parsed, so
+    # reruns after a chat turn make no embedding calls
+    added, new_files, documents, hashes = 0, 0, [], []
+    for file in files:
+        data = file.getvalue()
+        file_hash = content_hash(data)
+        hashes.append(file_hash)
+        if kb.has_file(file_hash):
+            continue
+        new_files += 1
+        if file.name.endswith(".csv"):
+            added += kb.add_stream(load_csv(file, st.empty()), source=file.name, file_hash=file_hash)
+        else:
+            documents.append((file.name, data, file_hash))
+
+    # PDFs/images: parse + OCR on every core, embed in capped batches
+    if documents:
+        pipeline = DocumentPipeline(kb)
+        table = st.empty()
+        added += pipeline.run(
+            documents, on_update=lambda _: table.dataframe(pipeline.report(), hide_index=True)
+        )
+    if new_files:
+        kb.save()
+    return hashes
 
 def rag_chat(query, vectordb):
     retriever = vectordb.as_retriever(search_kwargs={"k": 3})
@@ -194,20 +221,21 @@ with right_col:
     )
 
     if uploaded_files:
-        all_texts = []
-        for file in uploaded_files:
-            if file.name.endswith(".csv"):
-                all_texts.extend(load_csv(file))
-            elif file.name.endswith(".pdf"):
-                all_texts.extend(load_pdf(file))
-            else:
-                all_texts.append(load_image(file))
-
-        st.session_state.vectordb = create_vectorstore(all_texts)
+        knowledge_base = load_knowledge_base()
+        hashes = ingest_files(knowledge_base, uploaded_files)
+
+        vectordb = session_store(tuple(sorted(h for h in set(hashes) if knowledge_base.has_file(h))))
+        if vectordb is not None:
+            st.session_state.vectordb = vectordb
+        else:
+            st.session_state.pop("vectordb", None)
         st.markdown(
             '<p style="color:#00ff00;font-size:0.6rem;">[ DATA_STREAM_SYNCED ]</p>',
             unsafe_allow_html=True
         )
+    else:
+        # Nothing uploaded any more: stop answering from earlier files
+        st.session_state.pop("vectordb", None)
 
     st.markdown("""
     <div style="border:1px solid #555;padding:10px;font-size:0.5rem;color:#555;font-family:Source Code Pro;">
@@ -1,5 +1,9 @@
 import streamlit as st
-import pickle
+import os
+
+import pandas as pd
+
+from src.features.locality import RadiusIndex, property_attributes
 
 # -----------------------
 # PAGE CONFIG
@@ -28,8 +32,21 @@ st.markdown(
 # -----------------------
 # LOAD PICKLE DATA
 # -----------------------
-with open('location_df.pkl', 'rb') as file:
-    location_df = pickle.load(file)
+@st.cache_resource
+def load_radius_index():
+    # Compact store from `python -m src.features.locality build-store`;
+    # each landmark column is sorted once, a search is a binary search
+    if os.path.exists('locality_index.npz'):
+        return RadiusIndex.load('locality_index.npz')
+    return RadiusIndex.from_pickle('location_df.pkl', 'data_viz1.csv')
+
+@st.cache_data
+def load_attributes(properties):
+    # Median price / size per society, for attribute filters on search results
+    return property_attributes(properties, pd.read_csv('data_viz1.csv'))
+
+radius_index = load_radius_index()
+attributes = load_attributes(radius_index.properties.tolist())
 
 # -----------------------
 # USER INPUTS (Beautiful layout)
@@ -40,7 +57,7 @@ col1, col2 = st.columns([2, 1])
 with col1:
     selected_location = st.selectbox(
         "🏠 Choose a location:",
-        sorted(location_df.columns.tolist())
+        sorted(radius_index.landmarks.tolist())
     )
 with col2:
     radius = st.number_input("📏 Select radius (in kms):", min_value=0.0, max_value=50.0, step=0.5)
@@ -59,17 +76,14 @@ if search_button:
     st.markdown("<hr>", unsafe_allow_html=True)
     st.subheader("🏘️ Top Matching Properties")
 
-    result_ser = (
-        location_df[location_df['Gurgaon Railway Station'] < 4900.0]
-        .sort_values(by='Bajghera Road')
-        .head(5)
-        .index
-    )
+    results = radius_index.search(selected_location, radius)
+    if results.empty:
+        st.warning(f"No properties found within {radius} km of {selected_location}.")
 
     # -----------------------
     # DISPLAY AS BEAUTIFUL CARDS
     # -----------------------
-    for idx, val in enumerate(result_ser, start=1):
+    for idx, (val, dist) in enumerate(zip(results['PropertyName'], results['distance_km']), start=1):
         st.markdown(
             f"""
             <div style="
@@ -81,7 +95,7 @@ if search_button:
                 ">
                 <h4 style="color:#2E8B57; margin:0;">🏠 {idx}. {val}</h4>
                 <p style="color:gray; font-size:14px; margin:5px 0;">
-                    📍 Within 5km radius of Gurgaon Railway Station
+                    📍 {dist:.1f} km from {selected_location}
                 </p>
             </div>
             """,
@@ -94,6 +108,30 @@ if search_button:
 else:
     st.info("👆 Select a location and radius, then click **Search Nearby Properties** to view results.")
 
+# -----------------------
+# COMBINED SEARCH
+# -----------------------
+st.markdown("<hr>", unsafe_allow_html=True)
+st.markdown("<h3 style='color:#1E90FF;'>🧭 Combined Search</h3>", unsafe_allow_html=True)
+
+landmarks = st.multiselect("📍 Near all of these landmarks:", sorted(radius_index.landmarks.tolist()))
+constraints, weights = {}, {}
+for name in landmarks:
+    lc1, lc2 = st.columns(2)
+    with lc1:
+        constraints[name] = st.number_input(f"📏 Max km to {name}", 0.0, 50.0, 5.0, step=0.5, key=f"r_{name}")
+    with lc2:
+        weights[name] = st.number_input(f"⚖️ Ranking weight for {name}", 0.0, 10.0, 1.0, step=0.5, key=f"w_{name}")
+max_price = st.number_input("💰 Max price (Cr, 0 = any):", min_value=0.0, max_value=50.0, step=0.25)
+
+if st.button("🔎 Run Combined Search", disabled=not landmarks):
+    filters = {'price': (None, max_price)} if max_price else None
+    combined = radius_index.query(constraints, filters, attributes, weights)
+    if combined.empty:
+        st.warning("No properties satisfy every constraint.")
+    else:
+        st.dataframe(combined.round(2), use_container_width=True, hide_index=True)
+
 # -----------------------
 # FOOTER
 # -----------------------
@@ -1,7 +1,20 @@
 import streamlit as st
+import os
 import pickle
+import shutil
+import tempfile
 import numpy as np
 import pandas as pd
+import plotly.express as px
+
+from src.models.comparables import ComparablesIndex
+from src.models.prediction_cache import PredictionCache
+from src.models.predict_model import (
+    CAT_COLUMNS, NUM_COLUMNS, PORTFOLIO_DIR, PREDICTION_COLUMN, REPORT_DIR,
+    count_rows, known_categories, predict_csv, resolve_under,
+)
+from src.models.valuation_service import predict_remote
+from src.models.what_if import axis_values, sweep, to_surface
 
 # -----------------------------------
 # 1. PAGE CONFIG
@@ -60,11 +73,21 @@ header, footer {visibility: hidden;}
 def load_models():
     with open("d.pkl", "rb") as f:
         df = pickle.load(f)
-    with open("pipelin.pkl", "rb") as f:
-        pipeline = pickle.load(f)
-    return df, pipeline
+    # The cache owns the pipeline and reloads it when pipelin.pkl changes;
+    # the compiled fast path must match it on a d.pkl sample to be used
+    sample = df.sample(min(len(df), 200), random_state=0)
+    return df, PredictionCache("pipelin.pkl", maxsize=4096, sample=sample)
+
+df, valuation_cache = load_models()
 
-df, pipeline = load_models()
+@st.cache_resource
+def load_comparables():
+    # KD-tree over historical listings, built once per server process
+    return ComparablesIndex.from_csv(
+        "gurgaon_properties_missing_value_imputation.csv", "data_viz1.csv"
+    )
+
+comparables = load_comparables()
 
 # -----------------------------------
 # 4. HEADER
@@ -95,37 +118,40 @@ with col2:
     furnishing_type = st.selectbox("🪑 Furnishing Type", df['furnishing_type'].unique())
     luxury_category = st.selectbox("💎 Luxury Category", df['luxury_category'].unique())
     floor_category = st.selectbox("🏢 Floor Category", df['floor_category'].unique())
+    area_bucket = st.number_input("🧮 Area Bucket (sq.ft., 0 = exact)", 0, 500, 0, step=25)
 
 # -----------------------------------
 # 6. PREDICTION
 # -----------------------------------
-if st.button("🔮 GENERATE VALUATION REPORT", use_container_width=True):
+record = {
+    'property_type': str(property_type),
+    'sector': str(sector),
+    'bedRoom': float(bedRoom),
+    'bathroom': float(bathroom),
+    'balcony': str(balcony),
+    'agePossession': str(agePossession),
+    'built_up_area': float(built_up_area),
+    'servant room': float(servant_room),
+    'store room': float(store_room),
+    'furnishing_type': str(furnishing_type),
+    'luxury_category': str(luxury_category),
+    'floor_category': str(floor_category)
+}
 
-    input_df = pd.DataFrame([{
-        'property_type': str(property_type),
-        'sector': str(sector),
-        'bedRoom': float(bedRoom),
-        'bathroom': float(bathroom),
-        'balcony': str(balcony),
-        'agePossession': str(agePossession),
-        'built_up_area': float(built_up_area),
-        'servant room': float(servant_room),
-        'store room': float(store_room),
-        'furnishing_type': str(furnishing_type),
-        'luxury_category': str(luxury_category),
-        'floor_category': str(floor_category)
-    }])
-
-    # 🔒 Force categorical columns
-    cat_cols = [
-        'property_type','sector','balcony','agePossession',
-        'furnishing_type','luxury_category','floor_category'
-    ]
-    input_df[cat_cols] = input_df[cat_cols].astype("object")
+if st.button("🔮 GENERATE VALUATION REPORT", use_container_width=True):
 
     try:
-        prediction = pipeline.predict(input_df)
-        price = prediction[0]
+        # Route through the micro-batching service when one is running
+        service_url = os.environ.get("GARMANDI_VALUATION_URL")
+        if service_url:
+            # Same area snapping as the in-process cache
+            bucketed = PredictionCache.normalize(record, area_bucket=area_bucket or None)
+            price = predict_remote(service_url, [bucketed])[0]
+        else:
+            # ⚡ Repeat configurations are served from the LRU cache
+            price = valuation_cache.predict(record, area_bucket=area_bucket or None)
+        if price is None:
+            raise ValueError("input outside the model's training categories")
 
         st.markdown(f"""
         <div class="valuation-card">
@@ -137,11 +163,133 @@ if st.button("🔮 GENERATE VALUATION REPORT", use_container_width=True):
         </div>
         """, unsafe_allow_html=True)
 
+        if service_url:
+            st.caption(f"Valued by the batching service at {service_url}")
+        else:
+            cache_stats = valuation_cache.stats()
+            st.caption(
+                f"Cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+                f"({cache_stats['size']}/{cache_stats['maxsize']} entries)"
+            )
+
+        # 🧾 Supporting evidence: the most similar historical transactions
+        st.markdown("<p class='terminal-label'>Comparable Transactions</p>", unsafe_allow_html=True)
+        try:
+            st.dataframe(comparables.query_one(record, k=5), use_container_width=True, hide_index=True)
+        except ValueError as e:
+            st.info(f"No geo-coded comparables: {e}")
+
     except Exception as e:
         st.error(f"Computation Error: {e}")
 
 # -----------------------------------
-# 7. DEBUG
+# 7. BULK VALUATION (PORTFOLIO MODE)
+# -----------------------------------
+st.markdown("<hr style='border:0.5px solid rgba(212,175,55,0.15);'>", unsafe_allow_html=True)
+st.markdown("<p class='terminal-label'>Portfolio Batch Mode</p>", unsafe_allow_html=True)
+
+b1, b2 = st.columns(2, gap="large")
+
+with b1:
+    source_mode = st.radio("📂 Source", ["Upload CSV", "Server Path"], horizontal=True)
+    if source_mode == "Upload CSV":
+        source = st.file_uploader("Portfolio CSV", type=["csv"])
+    else:
+        source = st.text_input(f"CSV Path (inside {PORTFOLIO_DIR}/)", "") or None
+
+with b2:
+    save_as = st.text_input(f"💾 Save Copy As (inside {REPORT_DIR}/, optional)", "")
+    chunksize = st.number_input("Chunk Size (rows)", 1000, 200000, 10000, step=1000)
+
+# Every session scores into its own temp file, so concurrent users never
+# overwrite or download each other's results
+if "valuation_dir" not in st.session_state:
+    st.session_state.valuation_dir = tempfile.mkdtemp(prefix="garmandi-valuations-")
+output_path = os.path.join(st.session_state.valuation_dir, "valuations.csv")
+
+if st.button("📊 RUN BULK VALUATION", use_container_width=True, disabled=source is None):
+    bar = st.progress(0.0)
+    status = st.empty()
+    done = invalid = 0
+
+    try:
+        if isinstance(source, str):
+            source = resolve_under(PORTFOLIO_DIR, source)
+        save_path = resolve_under(REPORT_DIR, save_as) if save_as else None
+
+        total = count_rows(source)
+        valuation_cache.refresh()
+        for done, invalid, rate in predict_csv(
+            valuation_cache.pipeline, source, output_path,
+            categories=known_categories(df), chunksize=int(chunksize)
+        ):
+            bar.progress(min(done / total, 1.0) if total else 1.0)
+            status.markdown(
+                f"<p class='terminal-label'>{done:,} / {total:,} rows • {rate:,.0f} rows/sec</p>",
+                unsafe_allow_html=True
+            )
+
+        bar.progress(1.0)
+        st.success(f"Valued {done - invalid:,} properties")
+        if save_path:
+            os.makedirs(os.path.dirname(save_path), exist_ok=True)
+            shutil.copyfile(output_path, save_path)
+            st.caption(f"Saved a copy to {save_path}")
+        if invalid:
+            st.warning(f"{invalid:,} rows had unparseable numbers or unseen categories and were left blank.")
+        with open(output_path, "rb") as f:
+            st.download_button("⬇️ Download Valuations", f, file_name="valuations.csv", mime="text/csv")
+
+    except Exception as e:
+        st.error(f"Batch Error: {e}")
+
+# -----------------------------------
+# 8. WHAT-IF SWEEP (PRICE SURFACE)
+# -----------------------------------
+st.markdown("<hr style='border:0.5px solid rgba(212,175,55,0.15);'>", unsafe_allow_html=True)
+st.markdown("<p class='terminal-label'>What-If Price Surface</p>", unsafe_allow_html=True)
+
+w1, w2 = st.columns(2, gap="large")
+
+with w1:
+    x_axis = st.selectbox("↔️ Sweep Axis", NUM_COLUMNS, index=NUM_COLUMNS.index('built_up_area'))
+    x_lo, x_hi = st.slider(
+        "Range", float(df[x_axis].min()), float(df[x_axis].max()),
+        (float(df[x_axis].min()), float(df[x_axis].quantile(0.95)))
+    )
+    x_steps = st.number_input("Points", 5, 200, 40)
+
+with w2:
+    y_axis = st.selectbox("↕️ Second Axis", ["None"] + CAT_COLUMNS, index=1 + CAT_COLUMNS.index('sector'))
+    st.caption("Every value of the second axis from the training data is swept against the first; all other inputs come from the form above.")
+
+if st.button("🧭 RUN WHAT-IF SWEEP", use_container_width=True):
+    axes = {x_axis: axis_values(df, x_axis, x_lo, x_hi, int(x_steps))}
+    if y_axis != "None":
+        axes[y_axis] = axis_values(df, y_axis)
+
+    try:
+        valuation_cache.refresh()
+        result = sweep(valuation_cache.pipeline, record, axes, known_categories(df))
+
+        if y_axis == "None":
+            fig = px.line(result, x=x_axis, y=PREDICTION_COLUMN, title="PRICE CURVE")
+        else:
+            surface = to_surface(result, x_axis, y_axis)
+            fig = px.imshow(
+                surface, aspect="auto", color_continuous_scale=['#0a1a15', '#D4AF37'],
+                labels=dict(x=x_axis, y=y_axis, color="₹ Cr"), title="PRICE SURFACE"
+            )
+            fig.update_layout(height=max(400, 14 * len(surface)))
+        fig.update_layout(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font_color="#cbd5e1")
+        st.plotly_chart(fig, use_container_width=True)
+        st.caption(f"{len(result):,} configurations valued in one batched predict")
+
+    except Exception as e:
+        st.error(f"Sweep Error: {e}")
+
+# -----------------------------------
+# 9. DEBUG
 # # -----------------------------------
 # with st.expander("🔍 Debug"):
 #     st.write(input_df)
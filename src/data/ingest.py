@@ -0,0 +1,211 @@
+"""Document ingestion for Flora's knowledge base.
+
+CSV exports are streamed: ``pd.read_csv`` in chunks, and each chunk's
+rows are serialised to ``"a | b | c"`` strings with vectorised string
+concatenation instead of ``iterrows``. Cells are read as their raw text,
+which skips float parsing and re-formatting (empty cells stay empty
+rather than becoming ``nan``). Batches of row texts are yielded as they
+are produced, so the splitter and embedder consume a generator and peak
+memory is bounded by ``chunksize`` rather than the file size.
+
+PDFs and images go through ``DocumentPipeline``: parsing and OCR are
+CPU-bound and run in a process pool (one worker per core), while
+splitting and embedding run in a small thread pool (the embedding call
+is network-bound and rate-limited, so its concurrency is capped
+separately). The stages overlap: a file is embedded as soon as it is
+parsed while later files are still being parsed, and at most
+``max_in_flight`` files are between upload and index at any time, so a
+slow embedder holds back the parsers instead of letting parsed text pile
+up in memory.
+"""
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+
+import pandas as pd
+
+CSV_CHUNKSIZE = 20000
+ROW_SEPARATOR = ' | '
+EMBED_BATCH = 64
+EMBED_CONCURRENCY = 4
+
+
+def serialize_rows(frame, sep=ROW_SEPARATOR):
+    """``sep``-joined string per row, built column-wise."""
+    if frame.shape[1] == 0:
+        return [''] * len(frame)
+    columns = [frame[c].astype(str) for c in frame.columns]
+    return columns[0].str.cat(columns[1:], sep=sep).tolist()
+
+
+def iter_csv_texts(source, chunksize=CSV_CHUNKSIZE):
+    """Yield ``(texts, rows_done, rows_per_sec)`` per chunk of ``source``.
+
+    ``source`` is a path or a file-like object. ``rows_per_sec`` is the
+    running throughput since the first chunk was requested.
+    """
+    start = time.perf_counter()
+    done = 0
+    reader = pd.read_csv(source, chunksize=chunksize, dtype=str,
+                         keep_default_na=False)
+    for chunk in reader:
+        texts = serialize_rows(chunk)
+        done += len(texts)
+        elapsed = max(time.perf_counter() - start, 1e-9)
+        yield texts, done, done / elapsed
+
+
+def parse_pdf(data):
+    """Text of each page of the PDF in ``data`` (bytes)."""
+    # Imported here: only the pool workers need the parsers
+    from langchain_community.document_loaders import PyPDFLoader
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as f:
+        f.write(data)
+    try:
+        return [doc.page_content for doc in PyPDFLoader(f.name).load()]
+    finally:
+        os.remove(f.name)
+
+
+def ocr_image(data):
+    """OCR text of the image in ``data`` (bytes), as a one-item list."""
+    import pytesseract
+    from PIL import Image
+    return [pytesseract.image_to_string(Image.open(io.BytesIO(data)))]
+
+
+def parse_document(name, data):
+    """``(texts, seconds)`` for a PDF or image; runs in a pool worker."""
+    start = time.perf_counter()
+    parse = parse_pdf if name.lower().endswith('.pdf') else ocr_image
+    texts = parse(data)
+    return texts, time.perf_counter() - start
+
+
+class DocumentPipeline:
+    """Parse in processes, split and embed in threads, index into ``kb``.
+
+    ``kb`` is a ``KnowledgeBase``. ``status`` maps each file's content
+    hash to a dict with its ``name``, ``stage`` (queued, parsing,
+    embedding, done, failed), ``chunks``, ``parse_s``, ``embed_s`` and
+    ``error``; files that share a name keep separate entries.
+    """
+
+    def __init__(self, kb, workers=None, embed_concurrency=EMBED_CONCURRENCY,
+                 embed_batch=EMBED_BATCH, max_in_flight=None):
+        self.kb = kb
+        self.workers = workers or os.cpu_count() or 1
+        self.embed_concurrency = embed_concurrency
+        self.embed_batch = embed_batch
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.status = {}
+        self._file_chunks = {}
+
+    def _set(self, file_hash, **fields):
+        self.status[file_hash].update(fields)
+
+    def _embed(self, file_hash, texts, pool):
+        name = self.status[file_hash]['name']
+        docs, self._file_chunks[file_hash] = self.kb.new_chunks(
+            texts, source=name)
+        futures = [pool.submit(self.kb.index_chunks,
+                               docs[i:i + self.embed_batch])
+                   for i in range(0, len(docs), self.embed_batch)]
+        self._set(file_hash, stage='embedding',
+                  embed_start=time.perf_counter(), pending=len(futures))
+        return futures
+
+    def _finish(self, file_hash):
+        status = self.status[file_hash]
+        if 'embed_start' in status:
+            status['embed_s'] = time.perf_counter() - status['embed_start']
+        chunks = self._file_chunks.pop(file_hash, [])
+        if status['stage'] == 'failed':
+            return
+        if self.kb.mark_file(file_hash, status['name'], chunks):
+            self._set(file_hash, stage='done')
+        else:
+            # Left unrecorded, so the next run ingests the file again
+            self._set(file_hash, stage='failed',
+                      error='chunks shared with another upload were not '
+                            'indexed; retried on the next run')
+
+    def _parsed(self, future, file_hash, pool):
+        try:
+            texts, seconds = future.result()
+        except Exception as e:
+            self._set(file_hash, stage='failed', error=str(e))
+            return []
+        self._set(file_hash, parse_s=seconds)
+        futures = self._embed(file_hash, texts, pool)
+        if not futures:
+            self._finish(file_hash)
+        return futures
+
+    def _embedded(self, future, file_hash):
+        status = self.status[file_hash]
+        try:
+            status['chunks'] += future.result()
+        except Exception as e:
+            self._set(file_hash, stage='failed', error=str(e))
+        status['pending'] -= 1
+        if not status['pending']:
+            self._finish(file_hash)
+
+    def _enqueue(self, files):
+        queue = []
+        for name, data, file_hash in files:
+            if file_hash not in self.status:
+                self.status[file_hash] = {
+                    'name': name, 'stage': 'queued', 'chunks': 0,
+                    'parse_s': None, 'embed_s': None, 'error': None}
+                queue.append((name, data, file_hash))
+        # Popped from the end, so the first file is parsed first
+        return queue[::-1]
+
+    def run(self, files, on_update=None):
+        """Ingest ``files``, an iterable of ``(name, data, file_hash)``.
+
+        Files with the same content are ingested once. ``on_update(status)``
+        is called from this thread after every stage change. Returns the
+        number of new chunks; call ``kb.save()``.
+        """
+        queue = self._enqueue(files)
+        parsing, embedding, in_flight = {}, {}, set()
+        with ProcessPoolExecutor(self.workers) as parsers, \
+                ThreadPoolExecutor(self.embed_concurrency) as embedders:
+            while queue or parsing or embedding:
+                # Back-pressure: no new parse until a file leaves the index
+                while queue and len(in_flight) < self.max_in_flight:
+                    name, data, file_hash = queue.pop()
+                    future = parsers.submit(parse_document, name, data)
+                    parsing[future] = file_hash
+                    in_flight.add(file_hash)
+                    self._set(file_hash, stage='parsing')
+                if on_update is not None:
+                    on_update(self.status)
+                done, _ = wait(list(parsing) + list(embedding),
+                               return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in parsing:
+                        file_hash = parsing.pop(future)
+                        for f in self._parsed(future, file_hash, embedders):
+                            embedding[f] = file_hash
+                    else:
+                        file_hash = embedding.pop(future)
+                        self._embedded(future, file_hash)
+                    if self.status[file_hash]['stage'] in ('done', 'failed'):
+                        in_flight.discard(file_hash)
+        if on_update is not None:
+            on_update(self.status)
+        return sum(s['chunks'] for s in self.status.values())
+
+    def report(self):
+        """Per-file status as a DataFrame indexed by content hash."""
+        columns = ['name', 'stage', 'chunks', 'parse_s', 'embed_s', 'error']
+        frame = pd.DataFrame.from_dict(self.status, orient='index')
+        frame.index.name = 'file_hash'
+        return frame.reindex(columns=columns)
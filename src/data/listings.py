@@ -0,0 +1,132 @@
+"""Typed, columnar copies of the listing CSVs.
+
+The dashboards used to parse the CSVs as text and coerce numerics on
+every cold start. ``convert`` writes each dataset once as a Parquet
+dataset partitioned by sector, with explicit dtypes and dictionary
+(categorical) encoding for the low-cardinality text columns; ``load``
+then reads only the requested columns and sector partitions. When the
+Parquet copy is missing (or pyarrow is not installed) ``load`` falls back
+to the CSV with the same dtypes, so pages work either way.
+
+Build the copies with ``make data`` or::
+
+    python -m src.data.make_dataset . data/processed
+"""
+import hashlib
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:
+    pyarrow = None
+
+PARQUET_DIR = os.path.join('data', 'processed')
+CATEGORICAL = ['property_type', 'society', 'sector', 'balcony',
+               'agePossession']
+FLOAT64 = ['price', 'price_per_sqft', 'built_up_area', 'latitude',
+           'longitude']
+FLOAT32 = ['bedRoom', 'bathroom', 'floorNum', 'study room', 'servant room',
+           'store room', 'pooja room', 'others', 'furnishing_type',
+           'luxury_score']
+
+# dataset name -> source CSV
+DATASETS = {
+    'listings': 'gurgaon_properties_missing_value_imputation.csv',
+    'viz': 'data_viz1.csv',
+}
+SIGNATURE_BLOCK = 1 << 16
+
+
+def _coerce(frame):
+    for c in frame.columns:
+        if c in CATEGORICAL:
+            frame[c] = frame[c].astype('category')
+        elif c in FLOAT64 or c in FLOAT32:
+            frame[c] = pd.to_numeric(frame[c], errors='coerce').astype(
+                'float64' if c in FLOAT64 else 'float32')
+    return frame
+
+
+def read_csv(path, columns=None):
+    """The CSV with the same dtypes the Parquet copy would have."""
+    return _coerce(pd.read_csv(path, usecols=columns))
+
+
+def parquet_path(name, directory=PARQUET_DIR):
+    return os.path.join(directory, name)
+
+
+def source_path(name, directory=PARQUET_DIR):
+    """What ``load(name)`` reads: the Parquet dataset, else the CSV."""
+    path = parquet_path(name, directory)
+    if pyarrow is not None and os.path.isdir(path):
+        return path
+    return DATASETS[name]
+
+
+def file_signature(path, block=SIGNATURE_BLOCK):
+    """``(size, mtime_ns, sha1 of the first block)`` of ``path``."""
+    st = os.stat(path)
+    with open(path, 'rb') as f:
+        head = hashlib.sha1(f.read(block)).hexdigest()
+    return st.st_size, st.st_mtime_ns, head
+
+
+def version(name, directory=PARQUET_DIR):
+    """Signature of the files ``load(name)`` reads, for cache keys.
+
+    Changes when the Parquet copy is rebuilt, or when the CSV changes if
+    that is what is being read.
+    """
+    path = source_path(name, directory)
+    if not os.path.isdir(path):
+        return file_signature(path)
+    files = sorted(os.path.join(root, f)
+                   for root, _, names in os.walk(path) for f in names)
+    return tuple((os.path.relpath(f, path),) + file_signature(f)
+                 for f in files)
+
+
+def convert(csv_path, out_path):
+    """Write ``csv_path`` as a sector-partitioned Parquet dataset."""
+    if pyarrow is None:
+        raise ImportError("pyarrow is required to write Parquet")
+    frame = read_csv(csv_path)
+    frame['sector'] = frame['sector'].astype(str)
+    if os.path.isdir(out_path):
+        for root, dirs, files in os.walk(out_path, topdown=False):
+            for f in files:
+                os.remove(os.path.join(root, f))
+            for d in dirs:
+                os.rmdir(os.path.join(root, d))
+    frame.to_parquet(out_path, engine='pyarrow', partition_cols=['sector'],
+                     index=False)
+    return len(frame)
+
+
+def load(name, columns=None, sectors=None, directory=PARQUET_DIR):
+    """Dataset ``name`` restricted to ``columns`` and ``sectors``.
+
+    ``sectors`` is a list of sector names; with Parquet only those
+    partitions are read at all.
+    """
+    path = source_path(name, directory)
+    if os.path.isdir(path):
+        filters = [('sector', 'in', list(sectors))] if sectors else None
+        frame = pd.read_parquet(path, columns=columns, filters=filters)
+        # Partition keys come back as categoricals listing every sector
+        if 'sector' in frame:
+            frame['sector'] = frame['sector'].cat.remove_unused_categories()
+        return frame
+    usecols = None
+    if columns is not None:
+        usecols = list(columns) + (['sector'] if sectors else [])
+        usecols = list(dict.fromkeys(usecols))
+    frame = read_csv(DATASETS[name], usecols)
+    if sectors:
+        frame = frame[frame['sector'].isin(sectors)].reset_index(drop=True)
+        if columns is not None and 'sector' not in columns:
+            frame = frame.drop(columns='sector')
+    return frame
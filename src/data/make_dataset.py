@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+import logging
+import os
+
+import click
+
+from src.data.listings import DATASETS, convert
+
+
+@click.command()
+@click.argument('input_filepath', type=click.Path(exists=True))
+@click.argument('output_filepath', type=click.Path())
+def main(input_filepath, output_filepath):
+    """ Converts the listing CSVs in (../raw) into typed, sector-partitioned
+        Parquet datasets ready for the dashboards (saved in ../processed).
+    """
+    logger = logging.getLogger(__name__)
+    logger.info('making final data set from raw data')
+    for name, csv in DATASETS.items():
+        rows = convert(os.path.join(input_filepath, csv),
+                       os.path.join(output_filepath, name))
+        logger.info('%s: %d rows -> %s', name, rows,
+                    os.path.join(output_filepath, name))
+
+
+if __name__ == '__main__':
+    log_fmt = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    logging.basicConfig(level=logging.INFO, format=log_fmt)
+
+    main()
@@ -0,0 +1,104 @@
+"""Server-side kernel density rasters for the GIS heatmap.
+
+Listing coordinates are binned onto a regular lat/lon grid (one
+``histogram2d`` pass, with and without a value weight) and the grid is
+convolved with a Gaussian kernel in the frequency domain. The result is a
+count density, a value-weighted density and their ratio, the kernel
+-weighted local mean. The convolution costs O(G log G) in the number of
+grid cells, and binning is the only step that touches the listings. The
+page sends a layer to the browser as one image, so the payload depends
+on the grid size alone.
+"""
+import numpy as np
+
+KM_PER_DEGREE = 111.32
+GRID_SIZE = 200
+BANDWIDTH_KM = 0.75
+
+
+def gaussian_kernel(sigma_y, sigma_x, truncate=3.0):
+    """Normalised 2-D Gaussian (outer product of two 1-D kernels)."""
+    ry = max(int(np.ceil(truncate * sigma_y)), 1)
+    rx = max(int(np.ceil(truncate * sigma_x)), 1)
+    ky = np.exp(-0.5 * (np.arange(-ry, ry + 1) / max(sigma_y, 1e-9)) ** 2)
+    kx = np.exp(-0.5 * (np.arange(-rx, rx + 1) / max(sigma_x, 1e-9)) ** 2)
+    kernel = np.outer(ky, kx)
+    return kernel / kernel.sum()
+
+
+def fft_convolve(grid, kernel):
+    """``grid`` convolved with ``kernel``, same shape, zero boundary."""
+    ky, kx = kernel.shape
+    shape = (grid.shape[0] + ky - 1, grid.shape[1] + kx - 1)
+    spectrum = np.fft.rfft2(grid, shape) * np.fft.rfft2(kernel, shape)
+    out = np.fft.irfft2(spectrum, shape)
+    out = out[ky // 2:ky // 2 + grid.shape[0], kx // 2:kx // 2 + grid.shape[1]]
+    # FFT round-off leaves tiny negatives where the density is zero
+    return np.clip(out, 0, None)
+
+
+class DensityRaster:
+    """Smoothed count and ``value`` densities over a lat/lon grid.
+
+    ``count`` and ``weighted`` are (rows, cols) arrays indexed by
+    ``lats`` and ``lons`` (cell centres); ``mean`` is their ratio where
+    the count density is non-negligible.
+    """
+
+    def __init__(self, lat, lon, value=None, bounds=None, size=GRID_SIZE,
+                 bandwidth_km=BANDWIDTH_KM):
+        lat, lon = np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)
+        ok = np.isfinite(lat) & np.isfinite(lon)
+        if value is not None:
+            value = np.asarray(value, dtype=float)
+            ok &= np.isfinite(value)
+        lat, lon = lat[ok], lon[ok]
+        if bounds is None:
+            pad = 3 * bandwidth_km / KM_PER_DEGREE
+            bounds = (lat.min() - pad, lon.min() - pad,
+                      lat.max() + pad, lon.max() + pad)
+        south, west, north, east = bounds
+        self.bounds = bounds
+
+        # Square-ish cells: the longer side gets ``size`` cells
+        km_y = (north - south) * KM_PER_DEGREE
+        km_x = (east - west) * KM_PER_DEGREE * np.cos(
+            np.radians((north + south) / 2))
+        cell_km = max(km_y, km_x) / size
+        rows = max(int(np.ceil(km_y / cell_km)), 1)
+        cols = max(int(np.ceil(km_x / cell_km)), 1)
+        edges = [np.linspace(south, north, rows + 1),
+                 np.linspace(west, east, cols + 1)]
+        self.lats = (edges[0][:-1] + edges[0][1:]) / 2
+        self.lons = (edges[1][:-1] + edges[1][1:]) / 2
+        self.cell_km = cell_km
+
+        kernel = gaussian_kernel(bandwidth_km / cell_km,
+                                 bandwidth_km / cell_km)
+        counts, _, _ = np.histogram2d(lat, lon, bins=edges)
+        self.count = fft_convolve(counts, kernel)
+        self.weighted = self.mean = None
+        if value is not None:
+            sums, _, _ = np.histogram2d(lat, lon, bins=edges,
+                                        weights=value[ok])
+            self.weighted = fft_convolve(sums, kernel)
+            floor = self.count.max() * 1e-3
+            with np.errstate(invalid='ignore', divide='ignore'):
+                self.mean = np.where(self.count > floor,
+                                     self.weighted / self.count, np.nan)
+
+    def grid(self, layer='count', threshold=1e-3):
+        """``layer`` as a (rows, cols) array, NaN where negligible.
+
+        Cells below ``threshold`` × the layer maximum are blanked (the
+        ``mean`` layer is already NaN where there are no listings).
+        """
+        z = np.array(getattr(self, layer), dtype=float)
+        if layer != 'mean':
+            z[z <= np.nanmax(z) * threshold] = np.nan
+        return z
+
+    def corners(self):
+        """Raster corners as ``[lon, lat]``, clockwise from north-west."""
+        south, west, north, east = self.bounds
+        return [[west, north], [east, north], [east, south], [west, south]]
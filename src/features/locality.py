@@ -0,0 +1,257 @@
+"""Radius search around landmarks for Locality IQ.
+
+``location_df.pkl`` holds the distance in metres from every property to
+every landmark, with 54 km standing in for "not measured" in all but a
+few hundred of its cells. Only the measured pairs are kept: each
+landmark's distances are sorted once and stored back to back (CSR-style),
+so a radius query is a binary search for the cut-off and a slice of the
+prefix, O(log n + k), and the index costs O(P + L + measured pairs).
+
+The compact form is written once with::
+
+    python -m src.features.locality build-store
+
+and also carries property coordinates (from ``data_viz1.csv``), so a
+landmark added with a latitude/longitude gets its column from a
+vectorised haversine instead of a new scrape. Those coordinates are
+sector centroids, not society positions (``data_viz1.csv`` has one
+latitude/longitude pair per sector), so such columns are sector-level
+approximations, unlike the scraped per-property distances.
+
+Compound searches ("within 3 km of the station and 5 km of a metro, under
+2 Cr") intersect the per-landmark prefixes, smallest first, and only then
+look at attributes and scores for the surviving candidates.
+"""
+import argparse
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Placeholder the scraper wrote for pairs it never measured.
+UNMEASURED = 54000.0
+EARTH_RADIUS_M = 6371008.8
+
+
+def haversine_m(lat, lon, lat0, lon0):
+    """Great-circle metres from arrays ``lat``/``lon`` to one point."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    lat0, lon0 = np.radians(lat0), np.radians(lon0)
+    a = (np.sin((lat - lat0) / 2) ** 2
+         + np.cos(lat) * np.cos(lat0) * np.sin((lon - lon0) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+
+def property_coordinates(properties, viz_df):
+    """Coordinates per property name (NaN if unknown).
+
+    ``data_viz1.csv`` stores its sector's centroid for every society, so
+    these place a property at the centre of its sector, not at the
+    society itself.
+    """
+    coords = viz_df.groupby(viz_df['society'].str.lower())[
+        ['latitude', 'longitude']].median()
+    return coords.reindex(pd.Index(properties).str.lower()).to_numpy(float)
+
+
+def property_attributes(properties, viz_df):
+    """Median price (Cr), price per sq.ft and size per property name."""
+    columns = ['price', 'price_per_sqft', 'bedRoom', 'built_up_area']
+    medians = viz_df.groupby(viz_df['society'].str.lower())[columns].median()
+    medians = medians.reindex(pd.Index(properties).str.lower())
+    medians.index = pd.Index(properties)
+    return medians
+
+
+class RadiusIndex:
+    """Per-landmark presorted distances, stored as flat arrays.
+
+    Landmark ``j`` owns ``ids[offsets[j]:offsets[j + 1]]`` and the matching
+    ``distances`` (metres, ascending). ``coords`` holds each property's
+    sector-centroid latitude/longitude, NaN where it is not known.
+    """
+
+    def __init__(self, properties, landmarks, offsets, ids, distances,
+                 coords=None, hot_columns=16):
+        self.properties = pd.Index(properties)
+        self.landmarks = pd.Index(landmarks)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.distances = np.asarray(distances, dtype=np.float32)
+        if coords is None:
+            coords = np.full((len(self.properties), 2), np.nan)
+        self.coords = np.asarray(coords, dtype=float)
+        self.hot_columns = hot_columns
+        self._columns = OrderedDict()
+
+    @classmethod
+    def from_frame(cls, location_df, coords=None):
+        offsets, ids, distances = [0], [], []
+        for column in location_df.to_numpy(float).T:
+            keep = np.flatnonzero(column != UNMEASURED)
+            keep = keep[np.argsort(column[keep], kind='stable')]
+            ids.append(keep)
+            distances.append(column[keep])
+            offsets.append(offsets[-1] + len(keep))
+        return cls(location_df.index, location_df.columns, offsets,
+                   np.concatenate(ids), np.concatenate(distances), coords)
+
+    @classmethod
+    def from_pickle(cls, path='location_df.pkl', viz_path=None):
+        location_df = pd.read_pickle(path)
+        coords = None
+        if viz_path is not None:
+            coords = property_coordinates(location_df.index,
+                                          pd.read_csv(viz_path))
+        return cls.from_frame(location_df, coords)
+
+    def save(self, path):
+        np.savez(path, properties=self.properties.to_numpy(str),
+                 landmarks=self.landmarks.to_numpy(str),
+                 offsets=self.offsets, ids=self.ids,
+                 distances=self.distances, coords=self.coords)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f['properties'], f['landmarks'], f['offsets'],
+                       f['ids'], f['distances'], f['coords'])
+
+    def _slice(self, landmark):
+        j = self.landmarks.get_loc(landmark)
+        return slice(self.offsets[j], self.offsets[j + 1])
+
+    def within(self, landmark, radius_km):
+        """Property ids and metres within ``radius_km``, nearest first."""
+        s = self._slice(landmark)
+        distances = self.distances[s]
+        stop = np.searchsorted(distances, radius_km * 1000.0, side='right')
+        return self.ids[s][:stop], distances[:stop]
+
+    def search(self, landmark, radius_km, limit=None):
+        """``PropertyName``/``distance_km`` frame of properties in range."""
+        ids, metres = self.within(landmark, radius_km)
+        return pd.DataFrame({
+            'PropertyName': self.properties[ids[:limit]],
+            'distance_km': metres[:limit] / 1000.0,
+        })
+
+    def column(self, landmark):
+        """Dense metres to ``landmark`` for every property (NaN unmeasured).
+
+        The last ``hot_columns`` landmarks asked for stay materialised.
+        """
+        if landmark in self._columns:
+            self._columns.move_to_end(landmark)
+            return self._columns[landmark]
+        s = self._slice(landmark)
+        column = np.full(len(self.properties), np.nan, dtype=np.float32)
+        column[self.ids[s]] = self.distances[s]
+        self._columns[landmark] = column
+        if len(self._columns) > self.hot_columns:
+            self._columns.popitem(last=False)
+        return column
+
+    def _filter(self, candidates, filters, attributes):
+        rows = attributes.reindex(self.properties[candidates])
+        keep = np.ones(len(candidates), dtype=bool)
+        for column, (low, high) in filters.items():
+            values = rows[column].to_numpy(float)
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+        return candidates[keep]
+
+    def query(self, constraints, filters=None, attributes=None,
+              weights=None, limit=None):
+        """Properties meeting every distance and attribute constraint.
+
+        ``constraints`` maps landmark to radius in km. ``filters`` maps an
+        ``attributes`` column (a frame indexed like ``properties``, see
+        ``property_attributes``) to an inclusive ``(low, high)`` range,
+        either end ``None``. Results are ranked by the weighted sum of
+        distances in km (``weights`` per landmark, default 1), best first.
+        """
+        if not constraints:
+            raise ValueError("at least one distance constraint is required")
+        hits = sorted((self.within(landmark, radius)[0]
+                       for landmark, radius in constraints.items()), key=len)
+        candidates = np.sort(hits[0])
+        for ids in hits[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+
+        if filters:
+            if attributes is None:
+                raise ValueError("attribute filters need an attributes frame")
+            candidates = self._filter(candidates, filters, attributes)
+
+        weights = weights or {}
+        result = pd.DataFrame({'PropertyName': self.properties[candidates]})
+        score = np.zeros(len(candidates))
+        for landmark in constraints:
+            km = self.column(landmark)[candidates] / 1000.0
+            result[landmark] = km
+            score += weights.get(landmark, 1.0) * km
+        result['score'] = score
+        if attributes is not None:
+            result = result.join(attributes, on='PropertyName')
+        result = result.sort_values('score', kind='stable')
+        return result.head(limit).reset_index(drop=True)
+
+    def add_landmark(self, name, latitude, longitude):
+        """Index a new landmark from its coordinates; no scrape needed.
+
+        Distances run from each property's sector centroid, so they are
+        sector-level approximations: every society in a sector gets the
+        same value, off by up to the sector's radius. Properties without
+        known coordinates are left unmeasured.
+        """
+        if name in self.landmarks:
+            raise ValueError(f"landmark {name!r} already indexed")
+        metres = haversine_m(self.coords[:, 0], self.coords[:, 1],
+                             latitude, longitude)
+        keep = np.flatnonzero(np.isfinite(metres))
+        keep = keep[np.argsort(metres[keep], kind='stable')]
+        self.landmarks = self.landmarks.append(pd.Index([name]))
+        self.offsets = np.append(self.offsets, self.offsets[-1] + len(keep))
+        self.ids = np.concatenate([self.ids, keep.astype(np.int32)])
+        self.distances = np.concatenate(
+            [self.distances, metres[keep].astype(np.float32)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Locality radius index")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build-store',
+                           help='convert location_df.pkl to a compact npz')
+    build.add_argument('--location', default='location_df.pkl')
+    build.add_argument('--viz', default='data_viz1.csv',
+                       help='listings with society latitude/longitude')
+    build.add_argument('--out', default='locality_index.npz')
+    add = sub.add_parser('add-landmark', help='index a landmark by position')
+    add.add_argument('name')
+    add.add_argument('latitude', type=float)
+    add.add_argument('longitude', type=float)
+    add.add_argument('--store', default='locality_index.npz')
+    args = parser.parse_args()
+
+    if args.command == 'build-store':
+        index = RadiusIndex.from_pickle(args.location, args.viz)
+        index.save(args.out)
+        located = np.isfinite(index.coords).all(axis=1).sum()
+        print(f"{len(index.properties)} properties ({located} located), "
+              f"{len(index.landmarks)} landmarks, "
+              f"{len(index.ids)} measured pairs -> {args.out}")
+    else:
+        index = RadiusIndex.load(args.store)
+        index.add_landmark(args.name, args.latitude, args.longitude)
+        index.save(args.store)
+        print(f"{args.name}: {index.offsets[-1] - index.offsets[-2]} "
+              f"properties indexed (sector-centroid distances)")
+
+
+if __name__ == '__main__':
+    main()
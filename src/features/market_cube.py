@@ -0,0 +1,86 @@
+"""Pre-aggregated market cube for Market Pulse.
+
+Listings are reduced once per dataset version to one row per
+sector × property_type × bedRoom × agePossession cell holding count, sum
+and sum of squares for each metric. KPIs, rankings and drill-downs are
+then roll-ups of the cube (a few thousand cells at most), so widget
+interactions cost the same whether the listing has thousands of rows or
+millions.
+"""
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ['sector', 'property_type', 'bedRoom', 'agePossession']
+METRICS = ['price', 'price_per_sqft', 'built_up_area', 'luxury_score']
+STATS = ('count', 'sum', 'sumsq')
+
+
+def build_cube(listings, dimensions=DIMENSIONS, metrics=METRICS):
+    """count/sum/sumsq per metric for every populated dimension cell."""
+    frame = listings[list(dimensions)].copy()
+    for m in metrics:
+        values = pd.to_numeric(listings[m], errors='coerce')
+        frame[f'{m}_count'] = values.notna().astype(np.int64)
+        frame[f'{m}_sum'] = values.fillna(0.0)
+        frame[f'{m}_sumsq'] = values.fillna(0.0) ** 2
+    return frame.groupby(list(dimensions), dropna=False, observed=True).sum()
+
+
+def build_cube_chunked(chunks, dimensions=DIMENSIONS, metrics=METRICS):
+    """Same cube from an iterable of frames (e.g. ``read_csv(chunksize=)``)."""
+    parts = [build_cube(c, dimensions, metrics) for c in chunks]
+    return pd.concat(parts).groupby(level=list(dimensions), dropna=False,
+                                    observed=True).sum()
+
+
+class MarketCube:
+    """Roll-ups over a cube from ``build_cube``."""
+
+    def __init__(self, cube, metrics=METRICS):
+        self.cube = cube
+        self.metrics = list(metrics)
+
+    @classmethod
+    def from_frame(cls, listings, **kwargs):
+        return cls(build_cube(listings, **kwargs))
+
+    def _select(self, where):
+        cube = self.cube
+        for dim, value in (where or {}).items():
+            values = cube.index.get_level_values(dim)
+            if isinstance(value, (list, tuple, set)):
+                cube = cube[values.isin(value)]
+            else:
+                cube = cube[values == value]
+        return cube
+
+    def rollup(self, by=None, where=None):
+        """count/mean/std per metric grouped by ``by`` under ``where``.
+
+        ``by`` is a dimension name or list of them (``None`` for a grand
+        total, returned as a one-row frame); ``where`` maps a dimension to
+        a value or a collection of values to keep.
+        """
+        cube = self._select(where)
+        if by is None:
+            totals = cube.sum().to_frame().T
+        else:
+            totals = cube.groupby(level=by, observed=True).sum()
+        out = pd.DataFrame(index=totals.index)
+        for m in self.metrics:
+            n = totals[f'{m}_count']
+            s, ss = totals[f'{m}_sum'], totals[f'{m}_sumsq']
+            out[f'{m}_count'] = n
+            out[f'{m}_mean'] = s / n.where(n > 0)
+            var = (ss - s * s / n.where(n > 0)) / (n - 1).where(n > 1)
+            out[f'{m}_std'] = np.sqrt(var.clip(lower=0))
+        return out
+
+    def kpis(self, where=None):
+        """Grand-total row of ``rollup`` as a Series."""
+        return self.rollup(where=where).iloc[0]
+
+    def top(self, by, metric, n=15, where=None, ascending=False):
+        """The ``n`` groups of ``by`` ranked on the mean of ``metric``."""
+        ranked = self.rollup(by, where)[f'{metric}_mean'].dropna()
+        return ranked.sort_values(ascending=ascending).head(n)
@@ -0,0 +1,202 @@
+"""Streaming mean/variance/covariance for the dashboards.
+
+``OnlineMoments`` keeps the count, mean vector and co-moment matrix of a
+set of numeric columns and folds in one chunk at a time with the
+parallel form of Welford's update (Chan et al.). Two accumulators built
+over different chunks or processes merge into exactly the state a single
+pass would have produced, so correlations and per-sector moments come
+from a chunked scan of the CSV, and newly appended listings are folded
+in without rereading the old ones.
+
+Rows with a missing value in any tracked column are skipped, so the
+statistics are over complete rows.
+"""
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.data.listings import SIGNATURE_BLOCK, file_signature
+
+
+class OnlineMoments:
+    """Count, mean and co-moments of ``columns``; mergeable."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.m2 = np.zeros((k, k))
+
+    def _combine(self, n, mean, m2):
+        if not n:
+            return
+        total = self.n + n
+        delta = mean - self.mean
+        self.mean = self.mean + delta * (n / total)
+        self.m2 = self.m2 + m2 + np.outer(delta, delta) * (self.n * n / total)
+        self.n = total
+
+    def update(self, values):
+        """Fold in a 2-D array whose columns follow ``self.columns``."""
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values).all(axis=1)]
+        if len(values):
+            mean = values.mean(axis=0)
+            centred = values - mean
+            self._combine(len(values), mean, centred.T @ centred)
+        return self
+
+    def update_frame(self, frame):
+        values = frame[self.columns].apply(pd.to_numeric, errors='coerce')
+        return self.update(values.to_numpy(float))
+
+    def merge(self, other):
+        """Fold another accumulator over the same columns into this one."""
+        if other.columns != self.columns:
+            raise ValueError("cannot merge moments over different columns")
+        self._combine(other.n, other.mean, other.m2)
+        return self
+
+    def covariance(self, ddof=1):
+        cov = self.m2 / (self.n - ddof) if self.n > ddof else self.m2 * np.nan
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def variance(self, ddof=1):
+        return pd.Series(np.diag(self.covariance(ddof)), index=self.columns)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+    def correlation(self):
+        d = np.sqrt(np.diag(self.m2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.m2 / np.outer(d, d)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    def summary(self):
+        return pd.DataFrame({'count': self.n, 'mean': self.mean,
+                             'std': self.std().to_numpy()},
+                            index=self.columns)
+
+
+class GroupedMoments:
+    """One ``OnlineMoments`` per value of ``key``."""
+
+    def __init__(self, key, columns):
+        self.key = key
+        self.columns = list(columns)
+        self.groups = {}
+
+    def _group(self, name):
+        if name not in self.groups:
+            self.groups[name] = OnlineMoments(self.columns)
+        return self.groups[name]
+
+    def update_frame(self, frame):
+        for name, part in frame.groupby(self.key, sort=False):
+            self._group(name).update_frame(part)
+        return self
+
+    def merge(self, other):
+        for name, moments in other.groups.items():
+            self._group(name).merge(moments)
+        return self
+
+    def frame(self, stat='mean'):
+        """Group × column table of ``mean``, ``std`` or ``count``."""
+        rows = {}
+        for name, m in self.groups.items():
+            if stat == 'count':
+                rows[name] = pd.Series(m.n, index=self.columns)
+            elif stat == 'std':
+                rows[name] = m.std()
+            else:
+                rows[name] = pd.Series(m.mean, index=self.columns)
+        out = pd.DataFrame.from_dict(rows, orient='index',
+                                     columns=self.columns)
+        out.index.name = self.key
+        return out.sort_index()
+
+
+class CsvStats:
+    """Moments over a CSV read in chunks, resumable as rows are appended.
+
+    Only ``columns`` (and ``by``) are read. ``rows`` counts data rows
+    consumed so far, so calling ``scan`` again after listings have been
+    appended to the file folds in only the new rows. ``refresh`` does so
+    when the file has grown by a pure append: the first block and the
+    last block scanned are unchanged. If the file shrank or those blocks
+    differ (regenerated or edited), every statistic is rebuilt from a
+    full rescan. ``refresh`` is safe to call from concurrent sessions.
+    """
+
+    def __init__(self, path, columns, by=None, chunksize=50000):
+        self.path = path
+        self.by = by
+        self.chunksize = chunksize
+        self.rows = 0
+        self.overall = OnlineMoments(columns)
+        self.grouped = GroupedMoments(by, columns) if by else None
+        self._snapshot = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _block_hash(f, end):
+        f.seek(max(end - SIGNATURE_BLOCK, 0))
+        return hashlib.sha1(f.read(min(end, SIGNATURE_BLOCK))).hexdigest()
+
+    def _take_snapshot(self):
+        # The dataset signature (as used for cache keys) plus the hash of
+        # the last block, so a later pure append can be recognised
+        size, mtime, head = file_signature(self.path)
+        with open(self.path, 'rb') as f:
+            return size, mtime, head, self._block_hash(f, size)
+
+    def _appended(self, size):
+        """Whether the file is the last scanned one plus appended rows."""
+        if self._snapshot is None:
+            return False
+        old_size, _, head, tail = self._snapshot
+        if size < old_size:
+            return False
+        with open(self.path, 'rb') as f:
+            return (self._block_hash(f, min(old_size, SIGNATURE_BLOCK)) == head
+                    and self._block_hash(f, old_size) == tail)
+
+    def refresh(self):
+        """Fold in appended rows, or rescan if the file was rewritten."""
+        st = os.stat(self.path)
+        with self._lock:
+            if self._snapshot and self._snapshot[:2] == (st.st_size,
+                                                         st.st_mtime_ns):
+                return False
+            appended = self._appended(st.st_size)
+            # Taken before scanning: whatever lands meanwhile is still
+            # past the recorded end next time
+            snapshot = self._take_snapshot()
+            if appended:
+                self.scan()
+            else:
+                fresh = CsvStats(self.path, self.overall.columns, self.by,
+                                 self.chunksize).scan()
+                self.rows = fresh.rows
+                self.overall, self.grouped = fresh.overall, fresh.grouped
+            self._snapshot = snapshot
+        return True
+
+    def scan(self):
+        usecols = self.overall.columns + ([self.grouped.key]
+                                          if self.grouped else [])
+        reader = pd.read_csv(self.path, usecols=usecols,
+                             skiprows=range(1, self.rows + 1),
+                             chunksize=self.chunksize)
+        for chunk in reader:
+            self.overall.update_frame(chunk)
+            if self.grouped is not None:
+                self.grouped.update_frame(chunk)
+            self.rows += len(chunk)
+        return self
@@ -0,0 +1,101 @@
+"""Viewport queries over listing points for the GIS maps.
+
+Points are bucketed into a regular lat/lon grid and, inside each bucket,
+ordered by a priority key. A viewport query visits only the buckets that
+overlap the bounds and returns at most ``limit`` points, the highest
+priority first, so a map costs the same whatever the size of the area
+behind it. As the viewport shrinks on zoom-in, the same budget covers
+less ground and more of the local points appear; ``page`` fetches the
+next batch for the same view.
+
+The key is priority sampling (Duffield et al.): ``weight / u`` with ``u``
+uniform in (0, 1], from a fixed seed. High-weight listings (e.g. by price
+or recency) are favoured without hiding the rest. The sample is stable
+across reruns and nested across pages.
+"""
+import numpy as np
+import pandas as pd
+
+CELL_DEG = 0.01
+EARTH_CIRCUMFERENCE_DEG = 360.0
+
+
+def viewport_bounds(lat, lon, zoom, width_px=800, height_px=500):
+    """``(south, west, north, east)`` of a Web-Mercator map view."""
+    lon_span = EARTH_CIRCUMFERENCE_DEG * width_px / (256.0 * 2 ** zoom)
+    lat_span = lon_span * height_px / width_px * np.cos(np.radians(lat))
+    return (lat - lat_span / 2, lon - lon_span / 2,
+            lat + lat_span / 2, lon + lon_span / 2)
+
+
+class PointStore:
+    """Grid-bucketed listing points ordered by sampling priority."""
+
+    def __init__(self, df, weight=None, cell_deg=CELL_DEG, lat='latitude',
+                 lon='longitude', seed=0):
+        df = df[np.isfinite(df[lat]) & np.isfinite(df[lon])]
+        self.lat_col, self.lon_col = lat, lon
+        self.cell_deg = cell_deg
+        lats, lons = df[lat].to_numpy(float), df[lon].to_numpy(float)
+        self.origin = (lats.min(), lons.min()) if len(df) else (0.0, 0.0)
+        iy, ix = self._cell(lats, lons)
+        self.width = int(ix.max()) + 1 if len(df) else 1
+
+        u = 1.0 - np.random.default_rng(seed).random(len(df))
+        w = np.ones(len(df)) if weight is None else np.clip(
+            pd.to_numeric(df[weight], errors='coerce').fillna(0)
+            .to_numpy(float), 1e-12, None)
+        self.priority = w / u
+
+        keys = iy * self.width + ix
+        order = np.lexsort((-self.priority, keys))
+        self.points = df.iloc[order].reset_index(drop=True)
+        self.priority = self.priority[order]
+        self.lats, self.lons = lats[order], lons[order]
+        self.keys, self.starts = np.unique(keys[order], return_index=True)
+        self.ends = np.append(self.starts[1:], len(order))
+
+    def _cell(self, lat, lon):
+        iy = np.floor((lat - self.origin[0]) / self.cell_deg).astype(np.int64)
+        ix = np.floor((lon - self.origin[1]) / self.cell_deg).astype(np.int64)
+        return iy, ix
+
+    def __len__(self):
+        return len(self.points)
+
+    def _candidates(self, bounds, cap):
+        south, west, north, east = bounds
+        (y0, y1), (x0, x1) = [np.clip(v, 0, None) for v in self._cell(
+            np.array([south, north]), np.array([west, east]))]
+        x1 = min(x1, self.width - 1)
+        ids = []
+        for y in range(y0, y1 + 1):
+            lo = np.searchsorted(self.keys, y * self.width + x0)
+            hi = np.searchsorted(self.keys, y * self.width + x1, side='right')
+            for k, s, e in zip(self.keys[lo:hi], self.starts[lo:hi],
+                               self.ends[lo:hi]):
+                x = k - y * self.width
+                if y in (y0, y1) or x in (x0, x1):
+                    # Bucket straddles the bounds: check every point
+                    b = np.arange(s, e)
+                    b = b[(self.lats[b] >= south) & (self.lats[b] <= north)
+                          & (self.lons[b] >= west) & (self.lons[b] <= east)]
+                    ids.append(b[:cap])
+                else:
+                    # Priority-ordered and fully inside: only the head wins
+                    ids.append(np.arange(s, min(e, s + cap)))
+        return np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+
+    def query(self, bounds, limit=2000, page=0):
+        """Up to ``limit`` listings inside ``bounds``, highest priority
+        first, skipping the ``page * limit`` already shown."""
+        cap = (page + 1) * limit
+        ids = self._candidates(bounds, cap)
+        if len(ids) > cap:
+            ids = ids[np.argpartition(-self.priority[ids], cap - 1)[:cap]]
+        ids = ids[np.argsort(-self.priority[ids], kind='stable')]
+        return self.points.iloc[ids[page * limit:cap]]
+
+    def count(self, bounds):
+        """Number of listings inside ``bounds``."""
+        return len(self._candidates(bounds, len(self.points)))
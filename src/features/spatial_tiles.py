@@ -0,0 +1,102 @@
+"""Multi-resolution spatial aggregates for the GIS maps.
+
+Listings are binned once into Web-Mercator quadtree cells at the finest
+level, with a count and per-metric sums per cell; every coarser level is
+then a roll-up of the one below (a cell's parent is ``(x >> 1, y >> 1)``).
+A map at zoom ``z`` is drawn from the level a few steps finer than ``z``,
+so the number of markers depends on the viewport and level, never on how
+many listings the cells summarise.
+"""
+import numpy as np
+import pandas as pd
+
+MIN_LEVEL = 6
+MAX_LEVEL = 18
+# Cells per map tile edge is 2 ** DETAIL (3 -> 32 px cells on 256 px tiles)
+DETAIL = 3
+VALUE_COLUMNS = ('price', 'price_per_sqft')
+
+
+def tile_xy(lat, lon, level):
+    """Integer quadtree cell of each point at ``level``."""
+    n = 2 ** level
+    lat = np.radians(np.clip(lat, -85.05112878, 85.05112878))
+    x = (np.asarray(lon) + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(lat)) / np.pi) / 2.0 * n
+    return (np.clip(x, 0, n - 1).astype(np.int64),
+            np.clip(y, 0, n - 1).astype(np.int64))
+
+
+def tile_centre(x, y, level):
+    """Latitude/longitude of the centre of cells ``x``/``y``."""
+    n = 2 ** level
+    lon = (np.asarray(x) + 0.5) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(
+        np.pi * (1 - 2 * (np.asarray(y) + 0.5) / n))))
+    return lat, lon
+
+
+def zoom_for_bounds(lat, lon, width_px=800):
+    """Rough map zoom that fits ``lat``/``lon`` in ``width_px``."""
+    span = max(np.nanmax(lon) - np.nanmin(lon),
+               np.nanmax(lat) - np.nanmin(lat), 1e-3)
+    return int(np.clip(np.log2(360.0 * width_px / 256.0 / span), 1, 18))
+
+
+class TilePyramid:
+    """Count and sums of ``values`` per quadtree cell, per level."""
+
+    def __init__(self, levels, values=VALUE_COLUMNS):
+        self.levels = levels
+        self.values = list(values)
+        self.min_level, self.max_level = min(levels), max(levels)
+
+    @classmethod
+    def build(cls, df, values=VALUE_COLUMNS, min_level=MIN_LEVEL,
+              max_level=MAX_LEVEL, lat='latitude', lon='longitude'):
+        df = df[np.isfinite(df[lat]) & np.isfinite(df[lon])]
+        x, y = tile_xy(df[lat].to_numpy(float), df[lon].to_numpy(float),
+                       max_level)
+        base = pd.DataFrame({'x': x, 'y': y, 'count': 1})
+        for v in values:
+            column = pd.to_numeric(df[v], errors='coerce').to_numpy(float)
+            base[f'{v}_n'] = np.isfinite(column).astype(np.int64)
+            base[f'{v}_sum'] = np.nan_to_num(column)
+        levels = {max_level: base.groupby(['x', 'y']).sum()}
+        for level in range(max_level - 1, min_level - 1, -1):
+            child = levels[level + 1]
+            parent = [child.index.get_level_values(k).to_numpy() >> 1
+                      for k in ('x', 'y')]
+            levels[level] = child.groupby(parent).sum().rename_axis(
+                ['x', 'y'])
+        return cls(levels, values)
+
+    def level_for_zoom(self, zoom, detail=DETAIL):
+        return int(np.clip(round(zoom) + detail, self.min_level,
+                           self.max_level))
+
+    def cells(self, zoom, bounds=None, detail=DETAIL):
+        """Cells for a map at ``zoom``: centre, ``count`` and value means.
+
+        ``bounds`` is ``(south, west, north, east)`` in degrees; cells
+        outside it are dropped.
+        """
+        level = self.level_for_zoom(zoom, detail)
+        table = self.levels[level]
+        x = table.index.get_level_values('x').to_numpy()
+        y = table.index.get_level_values('y').to_numpy()
+        if bounds is not None:
+            south, west, north, east = bounds
+            x0, y1 = tile_xy(south, west, level)
+            x1, y0 = tile_xy(north, east, level)
+            keep = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+            table, x, y = table[keep], x[keep], y[keep]
+        lat, lon = tile_centre(x, y, level)
+        out = pd.DataFrame({'latitude': lat, 'longitude': lon,
+                            'count': table['count'].to_numpy()})
+        for v in self.values:
+            n = table[f'{v}_n'].to_numpy()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                out[v] = table[f'{v}_sum'].to_numpy() / n
+        out.attrs['level'] = level
+        return out
@@ -0,0 +1,136 @@
+"""Comparable-sales lookup for valuations.
+
+Historical listings from ``gurgaon_properties_missing_value_imputation.csv``
+are embedded into a small weighted feature space (sector location from
+``data_viz1.csv`` plus structure and age) and indexed once with a KD-tree,
+so the k most similar transactions for a valuation request are found in
+O(log n) instead of scanning the listing frame.
+"""
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+AGE_ORDER = {
+    'Under Construction': 0, 'New Property': 1, 'Relatively New': 2,
+    'Moderately Old': 3, 'Old Property': 4,
+}
+FURNISHING_ORDER = {'unfurnished': 0, 'semifurnished': 1, 'furnished': 2}
+
+# Relative importance of each embedded feature. Location is in km, the
+# rest are standardised, so 1.0 on a structural feature is roughly "one
+# standard deviation is as far as 1 km".
+DEFAULT_WEIGHTS = {
+    'x_km': 1.0, 'y_km': 1.0,
+    'property_type': 3.0, 'bedRoom': 1.5, 'bathroom': 0.5,
+    'log_area': 2.0, 'agePossession': 0.5,
+    'servant room': 0.25, 'store room': 0.25, 'furnishing_type': 0.25,
+}
+COMPARABLE_COLUMNS = [
+    'society', 'sector', 'property_type', 'bedRoom', 'bathroom',
+    'built_up_area', 'agePossession', 'price', 'price_per_sqft',
+]
+KM_PER_DEGREE = 111.32
+
+
+def sector_centroids(viz_df):
+    return viz_df.groupby('sector')[['latitude', 'longitude']].mean()
+
+
+class ComparablesIndex:
+    """KD-tree over historical listings in a weighted feature space."""
+
+    def __init__(self, listings, centroids, weights=None, leaf_size=40):
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.centroids = centroids
+        self.lat0 = np.radians(centroids['latitude'].mean())
+
+        # Listings in sectors without coordinates cannot be placed on the
+        # map, so they are left out of the index.
+        listings = listings[listings['sector'].isin(centroids.index)]
+        raw = self._raw_features(listings)
+        keep = raw.notna().all(axis=1).to_numpy()
+        self.listings = listings[keep][COMPARABLE_COLUMNS].reset_index(
+            drop=True)
+        raw = raw[keep]
+
+        self.columns = list(raw.columns)
+        self.mean = raw.mean().to_numpy(float, copy=True)
+        self.std = raw.std().replace(0, 1).to_numpy(float, copy=True)
+        geo = [c in ('x_km', 'y_km') for c in self.columns]
+        self.mean[geo], self.std[geo] = 0.0, 1.0
+        self.scale = np.array([self.weights[c] for c in self.columns])
+        self.tree = KDTree(self._embed(raw.to_numpy(float)),
+                           leaf_size=leaf_size)
+
+    @classmethod
+    def from_csv(cls, listings_path, viz_path, **kwargs):
+        listings = pd.read_csv(listings_path)
+        return cls(listings, sector_centroids(pd.read_csv(viz_path)),
+                   **kwargs)
+
+    def _raw_features(self, frame):
+        coords = self.centroids.reindex(frame['sector'].astype(str))
+        furnishing = frame['furnishing_type']
+        if not pd.api.types.is_numeric_dtype(furnishing):
+            furnishing = furnishing.map(FURNISHING_ORDER)
+        return pd.DataFrame({
+            'x_km': (coords['longitude'].to_numpy() * KM_PER_DEGREE
+                     * np.cos(self.lat0)),
+            'y_km': coords['latitude'].to_numpy() * KM_PER_DEGREE,
+            'property_type': (frame['property_type'] == 'house').to_numpy(
+                float),
+            'bedRoom': pd.to_numeric(frame['bedRoom'], errors='coerce'),
+            'bathroom': pd.to_numeric(frame['bathroom'], errors='coerce'),
+            'log_area': np.log1p(pd.to_numeric(frame['built_up_area'],
+                                               errors='coerce')),
+            'agePossession': frame['agePossession'].map(AGE_ORDER),
+            'servant room': pd.to_numeric(frame['servant room'],
+                                          errors='coerce'),
+            'store room': pd.to_numeric(frame['store room'],
+                                        errors='coerce'),
+            'furnishing_type': pd.to_numeric(furnishing, errors='coerce'),
+        }, index=frame.index)
+
+    def _embed(self, raw):
+        return (raw - self.mean) / self.std * self.scale
+
+    def _record_vector(self, rec):
+        lat, lon = self.centroids.loc[str(rec['sector'])]
+        furnishing = rec['furnishing_type']
+        if isinstance(furnishing, str):
+            furnishing = FURNISHING_ORDER[furnishing]
+        return [
+            lon * KM_PER_DEGREE * np.cos(self.lat0),
+            lat * KM_PER_DEGREE,
+            float(rec['property_type'] == 'house'),
+            float(rec['bedRoom']),
+            float(rec['bathroom']),
+            np.log1p(float(rec['built_up_area'])),
+            AGE_ORDER[rec['agePossession']],
+            float(rec['servant room']),
+            float(rec['store room']),
+            float(furnishing),
+        ]
+
+    def query(self, records, k=5):
+        """Top-k comparables for each request dict.
+
+        Returns one DataFrame per record with a ``distance`` column (lower
+        is more similar). Raises ``ValueError`` for a sector that has no
+        coordinates.
+        """
+        try:
+            raw = np.array([self._record_vector(r) for r in records])
+        except KeyError as e:
+            raise ValueError(f"no comparable coordinates for {e}") from None
+        dist, idx = self.tree.query(self._embed(raw),
+                                    k=min(k, len(self.listings)))
+        out = []
+        for d, i in zip(dist, idx):
+            comps = self.listings.iloc[i].reset_index(drop=True)
+            comps['distance'] = d
+            out.append(comps)
+        return out
+
+    def query_one(self, record, k=5):
+        return self.query([record], k)[0]
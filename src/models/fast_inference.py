@@ -0,0 +1,213 @@
+"""Array-native inference compiled from the fitted valuation pipeline.
+
+``pipeline.predict`` on a one-row DataFrame spends most of its time in
+pandas and ColumnTransformer bookkeeping, not in the forest. This module
+reads the fitted preprocessing steps once and turns them into plain
+lookup tables and scale vectors, so a request dict is encoded straight
+into the NumPy feature row the regressor expects.
+
+Check that it agrees with the pickled pipeline with::
+
+    python -m src.models.fast_inference --model pipelin.pkl --data d.pkl
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+
+from src.models.predict_model import FEATURE_COLUMNS, prepare_features
+
+PARITY_TOLERANCE = 1e-6
+
+
+class CompiledPipeline:
+    """Drop-in ``predict`` for a ColumnTransformer + regressor pipeline.
+
+    Supports the steps used by ``pipelin.pkl``: StandardScaler,
+    OrdinalEncoder, OneHotEncoder and passthrough/drop, with their default
+    options plus ``drop`` and ``handle_unknown`` (error, ignore,
+    use_encoded_value). Any other step or option (``with_mean=False``,
+    ``min_frequency``, ``max_categories``, infrequent categories, ...)
+    raises ``NotImplementedError`` so callers can fall back to the
+    pipeline itself.
+    """
+
+    def __init__(self, pipeline):
+        preprocessor = pipeline[0]
+        self.regressor = pipeline[-1]
+        if len(pipeline) != 2 or not hasattr(preprocessor, 'transformers_'):
+            raise NotImplementedError(
+                "expected a fitted (ColumnTransformer, regressor) pipeline")
+
+        self.numeric = []      # (column, output index, mean, scale)
+        self.lookups = []      # (column, output index, {value: code}, unknown)
+        self.onehots = []      # (column, {value: output index}, unknown)
+        width = 0
+        names = list(getattr(preprocessor, 'feature_names_in_',
+                             FEATURE_COLUMNS))
+        for _, trans, cols in preprocessor.transformers_:
+            cols = [names[c] if isinstance(c, (int, np.integer)) else c
+                    for c in cols]
+            if trans == 'drop' or not cols:
+                continue
+            width = self._compile_step(trans, cols, width)
+        self.width = width
+
+    def _compile_step(self, trans, cols, offset):
+        kind = type(trans).__name__ if trans != 'passthrough' else trans
+        _check_options(kind, trans)
+        if kind in ('StandardScaler', 'passthrough'):
+            mean = getattr(trans, 'mean_', None)
+            scale = getattr(trans, 'scale_', None)
+            for i, c in enumerate(cols):
+                self.numeric.append((
+                    c, offset + i,
+                    0.0 if mean is None else float(mean[i]),
+                    1.0 if scale is None else float(scale[i]),
+                ))
+            return offset + len(cols)
+
+        if kind == 'OrdinalEncoder':
+            unknown = (trans.unknown_value
+                       if trans.handle_unknown == 'use_encoded_value'
+                       else None)
+            for i, (c, cats) in enumerate(zip(cols, trans.categories_)):
+                table = {str(v): float(k) for k, v in enumerate(cats)}
+                self.lookups.append((c, offset + i, table, unknown))
+            return offset + len(cols)
+
+        if kind == 'OneHotEncoder':
+            drop = getattr(trans, 'drop_idx_', None)
+            for i, (c, cats) in enumerate(zip(cols, trans.categories_)):
+                dropped = None if drop is None else drop[i]
+                table = {}
+                for k, v in enumerate(cats):
+                    if k == dropped:
+                        table[str(v)] = -1
+                    else:
+                        table[str(v)] = offset
+                        offset += 1
+                self.onehots.append((c, table, trans.handle_unknown))
+            return offset
+
+        raise NotImplementedError(f"cannot compile {kind}")
+
+    def transform_records(self, records):
+        """Encode a list of feature dicts into the regressor's input."""
+        X = np.zeros((len(records), self.width))
+        for r, rec in enumerate(records):
+            row = X[r]
+            for c, j, mean, scale in self.numeric:
+                row[j] = (float(rec[c]) - mean) / scale
+            for c, j, table, unknown in self.lookups:
+                code = table.get(str(rec[c]), unknown)
+                if code is None:
+                    raise ValueError(f"unknown {c}: {rec[c]!r}")
+                row[j] = code
+            for c, table, handle_unknown in self.onehots:
+                j = table.get(str(rec[c]))
+                if j is None and handle_unknown == 'error':
+                    raise ValueError(f"unknown {c}: {rec[c]!r}")
+                if j is not None and j >= 0:
+                    row[j] = 1.0
+        return X
+
+    def predict_records(self, records):
+        return self.regressor.predict(self.transform_records(records))
+
+    def predict_one(self, record):
+        return float(self.predict_records([record])[0])
+
+
+def _check_options(kind, trans):
+    """Raise ``NotImplementedError`` for options the compiler ignores."""
+    if kind == 'passthrough':
+        return
+    params = trans.get_params()
+    if kind == 'StandardScaler':
+        unsupported = {k: params[k] for k in ('with_mean', 'with_std')
+                       if not params[k]}
+    elif kind in ('OrdinalEncoder', 'OneHotEncoder'):
+        unsupported = {k: params[k] for k in ('min_frequency',
+                                              'max_categories')
+                       if params.get(k) is not None}
+        if params['handle_unknown'] not in ('error', 'ignore',
+                                            'use_encoded_value'):
+            unsupported['handle_unknown'] = params['handle_unknown']
+        if getattr(trans, 'infrequent_categories_', None) is not None:
+            unsupported['infrequent_categories_'] = True
+        if kind == 'OrdinalEncoder' and not np.isnan(
+                params['encoded_missing_value']):
+            unsupported['encoded_missing_value'] = (
+                params['encoded_missing_value'])
+    else:
+        raise NotImplementedError(f"cannot compile {kind}")
+    if unsupported:
+        raise NotImplementedError(f"cannot compile {kind}({unsupported})")
+
+
+def compile_pipeline(pipeline, sample=None, tolerance=PARITY_TOLERANCE):
+    """Compiled fast path, or ``None`` if the pipeline is not supported.
+
+    With a ``sample`` frame (e.g. rows of ``d.pkl``) the compiled path is
+    also checked against ``pipeline.predict`` and rejected if any
+    prediction differs by more than ``tolerance``.
+    """
+    try:
+        compiled = CompiledPipeline(pipeline)
+    except NotImplementedError:
+        return None
+    if sample is not None:
+        try:
+            if check_parity(pipeline, compiled, sample) > tolerance:
+                return None
+        except (ValueError, KeyError, TypeError):
+            return None
+    return compiled
+
+
+def check_parity(pipeline, compiled, frame):
+    """Max absolute gap between the compiled path and ``pipeline.predict``."""
+    X, valid = prepare_features(frame)
+    X = X[valid]
+    expected = pipeline.predict(X)
+    actual = compiled.predict_records(X.to_dict('records'))
+    return float(np.max(np.abs(expected - actual)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity and latency check")
+    parser.add_argument('--model', default='pipelin.pkl')
+    parser.add_argument('--data', default='d.pkl')
+    parser.add_argument('--rows', type=int, default=200)
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        pipeline = pickle.load(f)
+    with open(args.data, 'rb') as f:
+        df = pickle.load(f)
+    compiled = CompiledPipeline(pipeline)
+
+    sample = df.head(args.rows)
+    gap = check_parity(pipeline, compiled, sample)
+    print(f"max |compiled - pipeline| over {len(sample)} rows: {gap:.3g}")
+
+    X, _ = prepare_features(sample)
+    records = X.to_dict('records')
+    start = time.perf_counter()
+    for i in range(len(X)):
+        pipeline.predict(X.iloc[[i]])
+    slow = (time.perf_counter() - start) / len(X)
+    start = time.perf_counter()
+    for rec in records:
+        compiled.predict_one(rec)
+    fast = (time.perf_counter() - start) / len(X)
+    print(f"single-row latency: pipeline {slow * 1e3:.2f} ms, "
+          f"compiled {fast * 1e3:.2f} ms")
+    if gap > PARITY_TOLERANCE:
+        raise SystemExit("compiled path diverges from pipeline.predict")
+
+
+if __name__ == '__main__':
+    main()
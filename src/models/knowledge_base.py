@@ -0,0 +1,274 @@
+"""Persistent, incrementally extended knowledge base for Flora.
+
+Every Streamlit rerun used to re-parse, re-embed and re-index every
+uploaded file. Here each corpus lives in its own directory:
+
+- ``embeddings.sqlite`` caches chunk vectors keyed by the SHA-256 of the
+  chunk text (namespaced by embedding model), so a chunk is embedded once
+  however many files or sessions it appears in;
+- ``index.faiss``/``index.pkl`` is the LangChain FAISS store, extended
+  only with chunks it has not indexed yet;
+- ``manifest.json`` lists the indexed chunk hashes and, per ingested
+  file (by content hash), the hashes of its chunks, so a file that was
+  seen before is skipped before it is even parsed.
+
+The persistent index is shared by every session, but retrieval must only
+see the files a session has uploaded: ``subset`` copies those files'
+stored vectors into a small in-memory FAISS store, with no embedding
+calls and no re-parsing.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+KB_ROOT = 'flora_kb'
+MANIFEST = 'manifest.json'
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+SQL_BATCH = 500
+# Seconds mark_file waits for chunks another caller is still embedding
+CLAIM_TIMEOUT = 600
+
+
+def content_hash(data):
+    """SHA-256 hex digest of ``data`` (``str`` is hashed as UTF-8)."""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """``embeddings`` with an on-disk cache of document vectors.
+
+    Only texts whose hash is not in the cache reach the underlying model,
+    in a single batch per call. Queries are never cached.
+    """
+
+    def __init__(self, embeddings, path, namespace=None):
+        self.embeddings = embeddings
+        self.path = path
+        self.namespace = namespace or getattr(
+            embeddings, 'model', type(embeddings).__name__)
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        with closing(sqlite3.connect(self.path)) as db, db:
+            db.execute('CREATE TABLE IF NOT EXISTS vectors '
+                       '(key TEXT PRIMARY KEY, vector BLOB)')
+
+    def _key(self, text):
+        return f'{self.namespace}:{content_hash(text)}'
+
+    def _lookup(self, db, keys):
+        found = {}
+        for i in range(0, len(keys), SQL_BATCH):
+            batch = keys[i:i + SQL_BATCH]
+            rows = db.execute(
+                'SELECT key, vector FROM vectors WHERE key IN '
+                f'({",".join("?" * len(batch))})', batch)
+            found.update((k, np.frombuffer(v, dtype=np.float32))
+                         for k, v in rows)
+        return found
+
+    def embed_documents(self, texts):
+        # The model call runs outside any lock so batches can be embedded
+        # concurrently; SQLite serialises the writes itself.
+        keys = [self._key(t) for t in texts]
+        with closing(sqlite3.connect(self.path, timeout=30)) as db:
+            found = self._lookup(db, list(set(keys)))
+        todo = {k: t for k, t in zip(keys, texts) if k not in found}
+        if todo:
+            vectors = self.embeddings.embed_documents(list(todo.values()))
+            fresh = {k: np.asarray(v, dtype=np.float32)
+                     for k, v in zip(todo, vectors)}
+            with closing(sqlite3.connect(self.path, timeout=30)) as db, db:
+                db.executemany(
+                    'INSERT OR REPLACE INTO vectors VALUES (?, ?)',
+                    [(k, v.tobytes()) for k, v in fresh.items()])
+            found.update(fresh)
+        with self._lock:
+            self.misses += len(todo)
+            self.hits += len(keys) - len(todo)
+        return [found[k].tolist() for k in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
+
+
+class KnowledgeBase:
+    """A named corpus: FAISS store plus manifest under ``directory``."""
+
+    def __init__(self, directory, embeddings, chunk_size=CHUNK_SIZE,
+                 chunk_overlap=CHUNK_OVERLAP):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.embeddings = CachedEmbeddings(
+            embeddings, os.path.join(directory, 'embeddings.sqlite'))
+        self.splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self._lock = threading.RLock()
+        # Notified whenever claimed chunks are indexed or released
+        self._indexed = threading.Condition(self._lock)
+
+        self.manifest = {'files': {}, 'chunks': []}
+        path = os.path.join(directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+        # Files recorded before per-file chunk lists are ingested again
+        # (their vectors are still cached)
+        self.manifest['files'] = {h: f for h, f in
+                                  self.manifest['files'].items()
+                                  if 'chunks' in f}
+        self._chunks = set(self.manifest['chunks'])
+
+        self.store = None
+        self._positions = {}
+        if os.path.exists(os.path.join(directory, 'index.faiss')):
+            self.store = FAISS.load_local(
+                directory, self.embeddings,
+                allow_dangerous_deserialization=True)
+            for i, doc_id in self.store.index_to_docstore_id.items():
+                doc = self.store.docstore.search(doc_id)
+                self._positions[content_hash(doc.page_content)] = i
+
+    def has_file(self, file_hash):
+        return file_hash in self.manifest['files']
+
+    def new_chunks(self, texts, source=None):
+        """Split ``texts``; returns ``(new_docs, chunk_hashes)``.
+
+        ``chunk_hashes`` covers every chunk of ``texts`` (for
+        ``mark_file``); ``new_docs`` are the chunks not indexed or claimed
+        yet, which are now claimed and must be passed to ``index_chunks``.
+        Concurrent callers never get the same chunk twice.
+        """
+        metadata = {'source': source} if source else {}
+        docs = self.splitter.create_documents(
+            list(texts), metadatas=[metadata] * len(texts))
+        new, hashes = [], []
+        with self._lock:
+            for doc in docs:
+                h = content_hash(doc.page_content)
+                hashes.append(h)
+                if h not in self._chunks:
+                    self._chunks.add(h)
+                    new.append(doc)
+        return new, hashes
+
+    def index_chunks(self, docs):
+        """Embed claimed ``docs`` (outside the lock) and add them.
+
+        On failure the claims are released so a retry can index them.
+        """
+        if not docs:
+            return 0
+        contents = [d.page_content for d in docs]
+        hashes = [content_hash(c) for c in contents]
+        try:
+            vectors = self.embeddings.embed_documents(contents)
+        except Exception:
+            with self._lock:
+                self._chunks.difference_update(hashes)
+                self._indexed.notify_all()
+            raise
+        pairs = list(zip(contents, vectors))
+        metadatas = [d.metadata for d in docs]
+        with self._lock:
+            start = 0
+            if self.store is None:
+                self.store = FAISS.from_embeddings(
+                    pairs, self.embeddings, metadatas=metadatas)
+            else:
+                start = self.store.index.ntotal
+                self.store.add_embeddings(pairs, metadatas=metadatas)
+            self._positions.update(
+                (h, start + i) for i, h in enumerate(hashes))
+            self.manifest['chunks'].extend(hashes)
+            self._indexed.notify_all()
+        return len(docs)
+
+    def _settled(self, chunks):
+        # Every chunk is indexed, or no longer claimed by anyone
+        return all(h in self._positions or h not in self._chunks
+                   for h in chunks)
+
+    def mark_file(self, file_hash, source=None, chunks=(),
+                  timeout=CLAIM_TIMEOUT):
+        """Record a file as ingested, with the hashes of its chunks.
+
+        Chunks another caller claimed and is still embedding are waited
+        for, up to ``timeout`` seconds. If any chunk is still not indexed
+        (its embedding failed elsewhere, or is still running) the file is
+        left unrecorded, so it is ingested again next time, and ``False``
+        is returned.
+        """
+        chunks = list(dict.fromkeys(chunks))
+        with self._indexed:
+            self._indexed.wait_for(lambda: self._settled(chunks), timeout)
+            if not all(h in self._positions for h in chunks):
+                return False
+            self.manifest['files'][file_hash] = {
+                'source': source, 'chunks': chunks}
+        return True
+
+    def add_texts(self, texts, source=None, file_hash=None):
+        """Split ``texts`` and index the chunks not seen before.
+
+        Returns the number of new chunks. Call ``save`` to persist.
+        """
+        return self.add_stream([texts], source, file_hash)
+
+    def add_stream(self, batches, source=None, file_hash=None):
+        """``add_texts`` over an iterable of text batches, one at a time.
+
+        The file is only recorded as ingested once every batch is in and
+        every chunk is indexed (see ``mark_file``). Returns the number of
+        new chunks.
+        """
+        added, chunks = 0, []
+        for texts in batches:
+            docs, hashes = self.new_chunks(texts, source)
+            added += self.index_chunks(docs)
+            chunks.extend(hashes)
+        if file_hash is not None:
+            self.mark_file(file_hash, source, chunks)
+        return added
+
+    def subset(self, file_hashes):
+        """In-memory FAISS store over the chunks of ``file_hashes`` only.
+
+        Vectors are copied from the persistent index, so nothing is
+        embedded again. Returns ``None`` if none of the files has chunks.
+        """
+        with self._lock:
+            files = self.manifest['files']
+            chunks = dict.fromkeys(h for f in file_hashes if f in files
+                                   for h in files[f]['chunks'])
+            positions = [self._positions[h] for h in chunks
+                         if h in self._positions]
+            if not positions:
+                return None
+            docs = [self.store.docstore.search(
+                self.store.index_to_docstore_id[i]) for i in positions]
+            vectors = [self.store.index.reconstruct(i).tolist()
+                       for i in positions]
+        return FAISS.from_embeddings(
+            [(d.page_content, v) for d, v in zip(docs, vectors)],
+            self.embeddings, metadatas=[d.metadata for d in docs])
+
+    def save(self):
+        with self._lock:
+            if self.store is not None:
+                self.store.save_local(self.directory)
+            tmp = os.path.join(self.directory, MANIFEST + '.tmp')
+            with open(tmp, 'w') as f:
+                json.dump(self.manifest, f)
+            os.replace(tmp, os.path.join(self.directory, MANIFEST))
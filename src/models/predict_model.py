@@ -0,0 +1,122 @@
+"""Batch scoring helpers for the valuation pipeline (``pipelin.pkl``)."""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+FEATURE_COLUMNS = [
+    'property_type', 'sector', 'bedRoom', 'bathroom', 'balcony',
+    'agePossession', 'built_up_area', 'servant room', 'store room',
+    'furnishing_type', 'luxury_category', 'floor_category',
+]
+CAT_COLUMNS = [
+    'property_type', 'sector', 'balcony', 'agePossession',
+    'furnishing_type', 'luxury_category', 'floor_category',
+]
+NUM_COLUMNS = [c for c in FEATURE_COLUMNS if c not in CAT_COLUMNS]
+
+PREDICTION_COLUMN = 'predicted_price'
+
+# Server-side portfolios are only read from, and saved reports only written
+# to, these directories (overridable for deployments)
+PORTFOLIO_DIR = os.environ.get('GARMANDI_PORTFOLIO_DIR', 'data/portfolios')
+REPORT_DIR = os.environ.get('GARMANDI_REPORT_DIR', 'reports/valuations')
+
+
+def resolve_under(root, path):
+    """``path`` resolved inside ``root``; ``ValueError`` if it escapes.
+
+    Relative paths are taken relative to ``root``. Symlinks are resolved
+    before the check, so a link pointing outside ``root`` is rejected.
+    """
+    root = os.path.realpath(root)
+    full = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([root, full]) != root or full == root:
+        raise ValueError(f"{path!r} is outside {root}")
+    return full
+
+
+def missing_columns(columns):
+    return [c for c in FEATURE_COLUMNS if c not in set(columns)]
+
+
+def known_categories(df):
+    """Category values seen in training, from ``d.pkl``."""
+    return {c: set(df[c].astype(str).unique()) for c in CAT_COLUMNS}
+
+
+def prepare_features(frame, categories=None):
+    """Coerce the 12 model columns to training dtypes.
+
+    Returns the feature frame and a boolean mask of rows the pipeline can
+    score: numeric fields must parse and, when ``categories`` is given,
+    every categorical must be a value the encoders were fitted on.
+    """
+    X = frame[FEATURE_COLUMNS].copy()
+    X[NUM_COLUMNS] = X[NUM_COLUMNS].apply(pd.to_numeric, errors='coerce')
+    X[CAT_COLUMNS] = X[CAT_COLUMNS].astype(str).astype("object")
+
+    valid = X[NUM_COLUMNS].notna().all(axis=1)
+    if categories is not None:
+        for c in CAT_COLUMNS:
+            valid &= X[c].isin(categories[c])
+    return X, valid.to_numpy()
+
+
+def predict_frame(pipeline, frame, categories=None):
+    """Vectorised ``pipeline.predict``; unscorable rows come back as NaN."""
+    X, valid = prepare_features(frame, categories)
+    out = np.full(len(X), np.nan)
+    if valid.any():
+        out[valid] = pipeline.predict(X[valid])
+    return out
+
+
+def count_rows(source):
+    """Cheap data-row count (newlines minus header) for progress bars."""
+    if hasattr(source, 'read'):
+        pos = source.tell()
+        n = sum(block.count(b'\n') for block in
+                iter(lambda: _as_bytes(source.read(1 << 20)), b''))
+        source.seek(pos)
+    else:
+        with open(source, 'rb') as f:
+            n = sum(block.count(b'\n') for block in
+                    iter(lambda: f.read(1 << 20), b''))
+    return max(n - 1, 0)
+
+
+def _as_bytes(block):
+    return block.encode() if isinstance(block, str) else block
+
+
+def predict_csv(pipeline, source, destination, categories=None,
+                chunksize=10000):
+    """Stream ``source`` through the pipeline in chunks.
+
+    Each scored chunk is appended to ``destination`` as soon as it is
+    ready, with a ``predicted_price`` column added. This is a generator:
+    after every chunk it yields ``(rows_done, rows_invalid, rows_per_sec)``
+    so the caller can drive a progress bar.
+
+    Raises ``ValueError`` before anything is written if any of the 12
+    feature columns is missing.
+    """
+    start = time.perf_counter()
+    done = invalid = 0
+    for i, chunk in enumerate(pd.read_csv(source, chunksize=chunksize)):
+        if i == 0:
+            missing = missing_columns(chunk.columns)
+            if missing:
+                raise ValueError(
+                    "Missing feature columns: " + ", ".join(missing))
+
+        chunk[PREDICTION_COLUMN] = predict_frame(pipeline, chunk, categories)
+        chunk.to_csv(destination, mode='w' if i == 0 else 'a',
+                     header=i == 0, index=False)
+
+        done += len(chunk)
+        invalid += int(chunk[PREDICTION_COLUMN].isna().sum())
+        elapsed = time.perf_counter() - start
+        yield done, invalid, done / elapsed if elapsed else 0.0
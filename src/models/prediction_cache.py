@@ -0,0 +1,91 @@
+"""Bounded LRU cache in front of the valuation pipeline.
+
+The valuation form is mostly selectboxes, so users keep asking for the
+same configurations. Predictions are memoised on the normalised input
+tuple; the built-up area can optionally be snapped to a bucket so nearby
+areas share an entry. The cache owns the loaded pipeline and reloads it
+(dropping every entry) as soon as ``pipelin.pkl`` changes on disk. A
+reloaded pipeline is only served through the compiled fast path if it
+matches ``pipeline.predict`` on the ``sample`` rows.
+"""
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from src.models.fast_inference import compile_pipeline
+from src.models.predict_model import CAT_COLUMNS, FEATURE_COLUMNS
+
+
+class PredictionCache:
+    """Memoised ``predict`` over the pickle at ``model_path``."""
+
+    def __init__(self, model_path='pipelin.pkl', maxsize=4096, sample=None):
+        self.model_path = model_path
+        self.sample = sample
+        self.maxsize = maxsize
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._signature = None
+        self.pipeline = self.fast = None
+        self.refresh()
+
+    def _stat(self):
+        st = os.stat(self.model_path)
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self):
+        """Reload the model and clear the cache if the pickle changed."""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        with open(self.model_path, 'rb') as f:
+            pipeline = pickle.load(f)
+        with self._lock:
+            self.pipeline = pipeline
+            self.fast = compile_pipeline(pipeline, self.sample)
+            self._entries.clear()
+            self._signature = signature
+        return True
+
+    @staticmethod
+    def normalize(record, area_bucket=None):
+        """Canonical feature dict; area snapped to ``area_bucket`` sq.ft."""
+        rec = {c: (str(record[c]) if c in CAT_COLUMNS else float(record[c]))
+               for c in FEATURE_COLUMNS}
+        if area_bucket:
+            area = round(rec['built_up_area'] / area_bucket) * area_bucket
+            rec['built_up_area'] = float(max(area, area_bucket))
+        return rec
+
+    def _predict_uncached(self, rec):
+        if self.fast is not None:
+            return self.fast.predict_one(rec)
+        frame = pd.DataFrame([rec])
+        frame[CAT_COLUMNS] = frame[CAT_COLUMNS].astype("object")
+        return float(self.pipeline.predict(frame)[0])
+
+    def predict(self, record, area_bucket=None):
+        self.refresh()
+        rec = self.normalize(record, area_bucket)
+        key = tuple(rec[c] for c in FEATURE_COLUMNS)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        price = self._predict_uncached(rec)
+        with self._lock:
+            self._entries[key] = price
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return price
+
+    def stats(self):
+        return {'size': len(self._entries), 'maxsize': self.maxsize,
+                'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,526 @@
+"""Asset Matcher similarity engines.
+
+``recommender_data.pkl`` holds three dense N×N cosine matrices (facilities,
+price details, location) that the page blends as
+``30 * sim1 + 20 * sim2 + 8 * sim3``. Dense matrices grow as N², so this
+module also builds a compact top-K neighbour index that keeps only the K
+best neighbours per property and component (int32 ids, float32 scores)
+and merges them at query time, so memory grows as N·K.
+
+The dense matrices can also be exported to a ``SimilarityStore``: one
+``.npy`` file per component plus a JSON list of property names, opened
+with memory mapping so rows are paged in on demand and every Streamlit
+worker shares the same physical pages instead of unpickling its own copy.
+The store can also keep the source vectors each component was computed
+from (``--features``); the pickle only ships them for location.
+
+Build the artifacts offline with::
+
+    python -m src.models.recommender build-topk --k 50
+    python -m src.models.recommender build-store --dtype float16 \
+        --features features.npz
+
+New listings and delistings are applied to the store incrementally with
+``add-properties`` / ``remove-properties``; ``compact-store`` rewrites it
+once the deltas pile up. Delistings are masked out of top-K results, but
+after an addition the top-K index no longer covers the store and must be
+rebuilt with ``build-topk --store recommender_store``.
+"""
+import argparse
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+COMPONENTS = ('cosine_sim1', 'cosine_sim2', 'cosine_sim3')
+DEFAULT_WEIGHTS = (30.0, 20.0, 8.0)
+MANIFEST = 'manifest.json'
+
+
+def load_recommender_pickle(path='recommender_data.pkl'):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def top_n_indices(scores, top_n, exclude=()):
+    """Indices of the ``top_n`` largest scores, best first.
+
+    Uses ``argpartition`` so only the winners are sorted; ``exclude`` ids
+    are masked out in place (``scores`` is a per-query scratch row).
+    """
+    scores[list(exclude)] = -np.inf
+    top_n = min(top_n, len(scores) - len(exclude))
+    if top_n <= 0:
+        return np.empty(0, dtype=np.intp)
+    part = np.argpartition(scores, -top_n)[-top_n:]
+    return part[np.argsort(-scores[part])]
+
+
+def blend_rows(rows, weights=DEFAULT_WEIGHTS):
+    """Weighted sum of one similarity row per component.
+
+    Only the selected row of every matrix is read, so a query is O(N)
+    with two N-length buffers instead of an N×N blended temporary.
+    """
+    scores = np.multiply(rows[0], weights[0], dtype=np.float64)
+    tmp = np.empty_like(scores)
+    for w, row in zip(weights[1:], rows[1:]):
+        np.multiply(row, w, out=tmp)
+        scores += tmp
+    return scores
+
+
+def _result_frame(names, ids, scores):
+    return pd.DataFrame({
+        'PropertyName': names[ids].tolist(),
+        'SimilarityScore': np.round(scores[ids], 3),
+    })
+
+
+def recommend_dense(matrices, names, property_name, top_n=10,
+                    weights=DEFAULT_WEIGHTS):
+    """Exact top-N from the dense matrices for runtime-chosen weights."""
+    i = names.get_loc(property_name)
+    scores = blend_rows([m[i] for m in matrices], weights)
+    return _result_frame(names, top_n_indices(scores, top_n, [i]), scores)
+
+
+def _unit_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class _Segment:
+    """A block of properties and their rows against all earlier ones.
+
+    The base segment is a full N×N block; each later segment holds its
+    m properties' similarities to every property before it and to each
+    other (m × (offset + m)). ``features`` keeps the unit-norm vectors a
+    component was computed from, when they are known.
+    """
+
+    def __init__(self, names, matrices, features=None):
+        self.names = list(names)
+        self.matrices = matrices
+        self.features = features or {}
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'names.json')) as f:
+            names = json.load(f)
+        matrices = [np.load(os.path.join(directory, f'{c}.npy'),
+                            mmap_mode='r') for c in COMPONENTS]
+        features = {}
+        for c in COMPONENTS:
+            path = os.path.join(directory, f'features_{c}.npy')
+            if os.path.exists(path):
+                features[c] = np.load(path, mmap_mode='r')
+        return cls(names, matrices, features)
+
+    def save(self, directory, dtype):
+        os.makedirs(directory, exist_ok=True)
+        for c, m in zip(COMPONENTS, self.matrices):
+            np.save(os.path.join(directory, f'{c}.npy'),
+                    np.asarray(m, dtype=dtype))
+        for c, v in self.features.items():
+            np.save(os.path.join(directory, f'features_{c}.npy'), v)
+        with open(os.path.join(directory, 'names.json'), 'w') as f:
+            json.dump(self.names, f)
+
+
+class SimilarityStore:
+    """Per-component similarity matrices addressed by property name.
+
+    Matrices are plain arrays when built from the pickle, or read-only
+    memmaps when opened from a store directory. Properties can be added
+    or delisted incrementally: an addition computes only the new rows
+    and is persisted as a delta segment next to the base files, and a
+    removal is a tombstone in ``manifest.json``. ``compact`` folds the
+    deltas back into a single base offline.
+
+    Tombstones are row positions, so a delisted property can be listed
+    again: the new row lives in a delta while the old one stays masked.
+    """
+
+    def __init__(self, segments, tombstones=(), directory=None):
+        self.segments = segments
+        self.tombstones = set(tombstones)
+        self.directory = directory
+        self._reindex()
+
+    def _reindex(self):
+        sizes = [len(s.names) for s in self.segments]
+        self.offsets = np.cumsum([0] + sizes)
+        self.names = pd.Index([n for s in self.segments for n in s.names])
+        self.removed_ids = np.array(sorted(self.tombstones), dtype=np.intp)
+        active = np.ones(len(self.names), dtype=bool)
+        active[self.removed_ids] = False
+        # Row of every listed name; a relisted name has a masked old row
+        self._active = pd.Series(np.flatnonzero(active),
+                                 index=self.names[active])
+        self.removed = set(self.names[~active]) - set(self._active.index)
+
+    @classmethod
+    def from_pickle(cls, path='recommender_data.pkl'):
+        data = load_recommender_pickle(path)
+        location = data['location_df_normalized']
+        # Only the location component ships with its source vectors; the
+        # facility and price matrices come without theirs.
+        base = _Segment(location.index, [data[c] for c in COMPONENTS],
+                        {'cosine_sim3': _unit_rows(location.to_numpy())})
+        return cls([base])
+
+    @classmethod
+    def open(cls, directory):
+        manifest = {'deltas': [], 'removed': []}
+        path = os.path.join(directory, MANIFEST)
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+        segments = [_Segment.load(directory)] + [
+            _Segment.load(os.path.join(directory, d))
+            for d in manifest['deltas']
+        ]
+        tombstones = manifest.get('tombstones')
+        if tombstones is None:
+            # Manifests written before relisting tombstoned by name
+            names = pd.Index([n for s in segments for n in s.names])
+            tombstones = np.flatnonzero(names.isin(manifest['removed']))
+        return cls(segments, tombstones, directory)
+
+    def set_features(self, component, names, vectors):
+        """Attach the source vectors ``component`` was computed from.
+
+        ``names`` label the rows of ``vectors`` and must cover every
+        property in the store. Stored vectors let ``add_properties``
+        compute new rows and the FAISS engine index the component
+        directly. Call ``save`` to persist them.
+        """
+        if component not in COMPONENTS:
+            raise ValueError(f"unknown component {component!r}")
+        rows = pd.Index(names).get_indexer(self.names)
+        if (rows < 0).any():
+            raise ValueError(f"{component}: no vectors for "
+                             f"{list(self.names[rows < 0][:5])}")
+        vectors = _unit_rows(np.asarray(vectors)[rows])
+        for s, start, stop in zip(self.segments, self.offsets[:-1],
+                                  self.offsets[1:]):
+            s.features[component] = vectors[start:stop]
+
+    def save(self, directory, dtype='float32'):
+        """Write a fresh single-segment store (compacting if needed)."""
+        compacted = len(self.segments) == 1 and not self.tombstones
+        store = self if compacted else self.compact()
+        store.segments[0].save(directory, dtype)
+        store.directory = directory
+        store._write_manifest([])
+
+    def _write_manifest(self, deltas):
+        tmp = os.path.join(self.directory, MANIFEST + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump({'deltas': deltas, 'removed': sorted(self.removed),
+                       'tombstones': [int(i) for i in self.removed_ids]}, f)
+        os.replace(tmp, os.path.join(self.directory, MANIFEST))
+
+    @property
+    def dtype(self):
+        return self.segments[0].matrices[0].dtype
+
+    def active_names(self):
+        return self.names.delete(self.removed_ids)
+
+    def row(self, component, i):
+        """Full similarity row ``i`` of one component across segments."""
+        s = np.searchsorted(self.offsets, i, side='right') - 1
+        head = self.segments[s].matrices[component][i - self.offsets[s]]
+        tail = [t.matrices[component][:, i] for t in self.segments[s + 1:]]
+        return np.concatenate([head, *tail]) if tail else head
+
+    def rows(self, i):
+        return [self.row(c, i) for c in range(len(COMPONENTS))]
+
+    def row_block(self, component, ids):
+        """Rows ``ids`` of one component as a len(ids) × N array."""
+        if len(self.segments) == 1:
+            return np.asarray(self.segments[0].matrices[component][ids])
+        return np.stack([self.row(component, i) for i in ids])
+
+    def _lookup(self, property_name):
+        if property_name in self.removed:
+            raise KeyError(f"{property_name} has been delisted")
+        return int(self._active[property_name])
+
+    def recommend(self, property_name, top_n=10, weights=DEFAULT_WEIGHTS):
+        i = self._lookup(property_name)
+        scores = blend_rows(self.rows(i), weights)
+        best = top_n_indices(scores, top_n, [i, *self.removed_ids])
+        return _result_frame(self.names, best, scores)
+
+    def recommend_basket(self, property_names, top_n=10,
+                         weights=DEFAULT_WEIGHTS, basket_weights=None):
+        """Top-N matches for a basket of reference properties.
+
+        Each member's blended similarity row is averaged, weighted by
+        ``basket_weights`` (equal by default), in one matrix product per
+        component; basket members themselves are never returned.
+        """
+        ids = [self._lookup(n) for n in property_names]
+        if not ids:
+            raise ValueError("empty basket")
+        bw = np.ones(len(ids)) if basket_weights is None else \
+            np.asarray(basket_weights, dtype=np.float64)
+        if bw.sum() <= 0:
+            raise ValueError("basket weights must sum to a positive value")
+        bw = bw / bw.sum()
+        scores = np.zeros(len(self.names))
+        for c, w in enumerate(weights):
+            scores += w * (bw @ self.row_block(c, ids))
+        best = top_n_indices(scores, top_n, [*ids, *self.removed_ids])
+        return _result_frame(self.names, best, scores)
+
+    def add_properties(self, names, features=None, rows=None):
+        """Append new properties without touching existing rows.
+
+        For each component pass either ``features[component]`` (m × d
+        vectors in the same space as that component's stored vectors;
+        similarities are computed as cosine against them) or
+        ``rows[component]``, precomputed similarities of shape
+        m × (N + m) against every current property and the new ones.
+        Cost is O(m·N·d), not a full O(N²) rebuild.
+        """
+        names = list(names)
+        features, rows = features or {}, rows or {}
+        clash = self._active.index.intersection(names)
+        if len(clash) or len(set(names)) != len(names):
+            raise ValueError(f"already listed: {list(clash)}")
+
+        n, m = len(self.names), len(names)
+        matrices, new_features = [], {}
+        for c in COMPONENTS:
+            if c in rows:
+                block = np.asarray(rows[c], dtype=self.dtype)
+            elif c in features and all(c in s.features
+                                       for s in self.segments):
+                new = _unit_rows(features[c])
+                old = np.concatenate([s.features[c] for s in self.segments])
+                block = (new @ np.vstack([old, new]).T).astype(self.dtype)
+                new_features[c] = new
+            else:
+                raise ValueError(f"{c}: pass precomputed rows, no stored "
+                                 "vectors to compute them from")
+            if block.shape != (m, n + m):
+                raise ValueError(f"{c}: expected rows of shape {(m, n + m)}")
+            matrices.append(block)
+
+        segment = _Segment(names, matrices, new_features)
+        self.segments.append(segment)
+        self._reindex()
+        if self.directory:
+            deltas = [f'delta-{k:04d}' for k in range(1, len(self.segments))]
+            segment.save(os.path.join(self.directory, deltas[-1]),
+                         self.dtype)
+            self._write_manifest(deltas)
+
+    def remove_properties(self, names):
+        """Delist properties; they stop appearing in results at once."""
+        missing = set(names) - set(self.names)
+        if missing:
+            raise KeyError(f"unknown properties: {sorted(missing)}")
+        listed = self._active.index.intersection(list(names))
+        self.tombstones.update(self._active[listed].tolist())
+        self._reindex()
+        if self.directory:
+            self._write_manifest(
+                [f'delta-{k:04d}' for k in range(1, len(self.segments))])
+
+    def compact(self):
+        """Single-segment copy without deltas or delisted properties."""
+        keep = np.setdiff1d(np.arange(len(self.names)), self.removed_ids)
+        matrices = [np.stack([self.row(c, i)[keep] for i in keep])
+                    for c in range(len(COMPONENTS))]
+        features = {
+            c: np.concatenate([s.features[c] for s in self.segments])[keep]
+            for c in COMPONENTS
+            if all(c in s.features for s in self.segments)
+        }
+        return SimilarityStore([_Segment(self.names[keep], matrices,
+                                         features)])
+
+
+def stale_names(names, store):
+    """Names an index was built with that ``store`` no longer lists.
+
+    Delistings since the build only need masking (pass the result as
+    ``removed``), but after an addition the index misses the new
+    properties and ``None`` says it must be rebuilt. A property that
+    was delisted and listed again keeps the neighbours it had at build
+    time until the index is rebuilt.
+    """
+    active = set(store.active_names())
+    if not active.issubset(names):
+        return None
+    return set(names) - active
+
+
+def top_k_neighbours(matrices, k, chunk_rows=1024):
+    """Candidate neighbours of every row with their per-component scores.
+
+    For each row the candidates are the union of the ``k`` best neighbours
+    (self excluded) in each of ``matrices``; every candidate keeps its
+    exact score in all components, so any blend of the components can be
+    ranked exactly at query time. Matrices may be any 2-D array-likes,
+    including memmaps; they are read ``chunk_rows`` rows at a time so
+    temporaries stay chunk × N.
+
+    Returns ``(ids, scores)``: an N × M int32 array padded with -1 and a
+    C × N × M float32 array, where M is at most C·k.
+    """
+    n = matrices[0].shape[0]
+    k = min(k, n - 1)
+    rows_ids, rows_scores = [], []
+    for start in range(0, n, chunk_rows):
+        blocks = [np.array(m[start:start + chunk_rows], dtype=np.float32)
+                  for m in matrices]
+        for r in range(blocks[0].shape[0]):
+            cand = set()
+            for b in blocks:
+                row = b[r].copy()
+                row[start + r] = -np.inf
+                cand.update(np.argpartition(row, -k)[-k:].tolist())
+            cand = np.fromiter(sorted(cand), dtype=np.int32)
+            rows_ids.append(cand)
+            rows_scores.append(np.stack([b[r, cand] for b in blocks]))
+
+    width = max(len(c) for c in rows_ids)
+    ids = np.full((n, width), -1, dtype=np.int32)
+    scores = np.zeros((len(matrices), n, width), dtype=np.float32)
+    for i, (cand, sc) in enumerate(zip(rows_ids, rows_scores)):
+        ids[i, :len(cand)] = cand
+        scores[:, i, :len(cand)] = sc
+    return ids, scores
+
+
+class TopKIndex:
+    """Sparse neighbour lists that replace the dense matrices at query time.
+
+    Memory is N·M ids plus C·N·M scores (M ≤ C·K) instead of C·N² floats.
+    """
+
+    def __init__(self, names, ids, scores):
+        self.names = pd.Index(names)
+        self.ids = ids
+        self.scores = scores
+
+    @classmethod
+    def build(cls, data, k=50):
+        ids, scores = top_k_neighbours([data[c] for c in COMPONENTS], k)
+        return cls(data['location_df_normalized'].index, ids, scores)
+
+    @classmethod
+    def from_store(cls, store, k=50):
+        """Index of a ``SimilarityStore``'s active properties."""
+        store = store.compact()
+        ids, scores = top_k_neighbours(store.segments[0].matrices, k)
+        return cls(store.names, ids, scores)
+
+    def save(self, path):
+        np.savez(path, names=np.asarray(self.names, dtype=str),
+                 ids=self.ids, scores=self.scores)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            return cls(z['names'], z['ids'], z['scores'])
+
+    def recommend(self, property_name, top_n=10, weights=DEFAULT_WEIGHTS,
+                  removed=()):
+        """Top-N neighbours of ``property_name``, skipping ``removed``."""
+        i = self.names.get_loc(property_name)
+        valid = self.ids[i] >= 0
+        cand = self.ids[i][valid]
+        total = np.tensordot(np.asarray(weights, dtype=np.float64),
+                             self.scores[:, i, valid], axes=1)
+        gone = np.flatnonzero(self.names[cand].isin(removed))
+        best = top_n_indices(total, top_n, gone)
+        return pd.DataFrame({
+            'PropertyName': self.names[cand[best]].tolist(),
+            'SimilarityScore': np.round(total[best].astype(float), 3),
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Asset Matcher artifacts")
+    sub = parser.add_subparsers(dest='command', required=True)
+    topk = sub.add_parser('build-topk', help='build the top-K index')
+    topk.add_argument('--data', default='recommender_data.pkl')
+    topk.add_argument('--store', help='build from a similarity store '
+                      '(with its deltas and delistings) instead of --data')
+    topk.add_argument('--k', type=int, default=50)
+    topk.add_argument('--out', default='recommender_topk.npz')
+    store = sub.add_parser('build-store', help='export memory-mapped store')
+    store.add_argument('--data', default='recommender_data.pkl')
+    store.add_argument('--dtype', default='float32',
+                       choices=['float32', 'float16'])
+    store.add_argument('--out', default='recommender_store')
+    store.add_argument(
+        '--features', help='.npz holding names plus features_<component> '
+        'source vectors to store alongside the matrices')
+    add = sub.add_parser(
+        'add-properties', help='append properties from an .npz holding '
+        'names plus features_<component> or rows_<component> arrays')
+    add.add_argument('input')
+    add.add_argument('--store', default='recommender_store')
+    remove = sub.add_parser('remove-properties', help='delist properties')
+    remove.add_argument('names', nargs='+')
+    remove.add_argument('--store', default='recommender_store')
+    compact = sub.add_parser('compact-store',
+                             help='fold deltas and delistings into a base')
+    compact.add_argument('--store', default='recommender_store')
+    compact.add_argument('--out', required=True)
+    args = parser.parse_args()
+
+    if args.command == 'build-topk':
+        if args.store:
+            index = TopKIndex.from_store(SimilarityStore.open(args.store),
+                                         args.k)
+        else:
+            index = TopKIndex.build(load_recommender_pickle(args.data),
+                                    args.k)
+        index.save(args.out)
+        print(f"{len(index.names)} properties, {index.ids.shape[1]}"
+              f" candidates each -> {args.out}")
+    elif args.command == 'build-store':
+        store = SimilarityStore.from_pickle(args.data)
+        if args.features:
+            with np.load(args.features) as z:
+                for c in COMPONENTS:
+                    if f'features_{c}' in z:
+                        store.set_features(c, z['names'], z[f'features_{c}'])
+        store.save(args.out, args.dtype)
+        print(f"{args.dtype} similarity store -> {args.out}")
+    elif args.command == 'add-properties':
+        store = SimilarityStore.open(args.store)
+        with np.load(args.input) as z:
+            store.add_properties(
+                z['names'].tolist(),
+                features={c: z[f'features_{c}'] for c in COMPONENTS
+                          if f'features_{c}' in z},
+                rows={c: z[f'rows_{c}'] for c in COMPONENTS
+                      if f'rows_{c}' in z},
+            )
+        print(f"{len(store.active_names())} active properties")
+    elif args.command == 'remove-properties':
+        store = SimilarityStore.open(args.store)
+        store.remove_properties(args.names)
+        print(f"{len(store.active_names())} active properties")
+    elif args.command == 'compact-store':
+        store = SimilarityStore.open(args.store)
+        store.save(args.out, str(store.dtype))
+        print(f"compacted store -> {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,221 @@
+"""Approximate nearest-neighbour engine for the Asset Matcher.
+
+Each similarity component is served from a FAISS inner-product index over
+unit-norm property vectors: exact ``IndexFlatIP`` for small catalogues,
+``IndexIVFFlat`` or ``IndexHNSWFlat`` for large ones. A weighted query
+searches every component for a candidate pool, then rescores the pool
+exactly with the stored vectors, so runtime weights need no rebuild.
+
+Vectors come from the similarity store: the location vectors ship with
+the pickle, and the facility and price vectors are stored with
+``build-store --features``. Without them a small catalogue falls back to
+factorising the matrix once, S ≈ F Fᵀ via its eigendecomposition, which
+reproduces the cosine scores to float precision; that needs the dense
+N × N matrix and O(N³) time, so it is refused above
+``FACTORIZE_MAX_ROWS``.
+
+Build and compare against the exact dense engine with::
+
+    python -m src.models.recommender_faiss build --index auto
+    python -m src.models.recommender_faiss report
+"""
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+import pandas as pd
+
+from src.models.recommender import (
+    COMPONENTS, DEFAULT_WEIGHTS, SimilarityStore, _result_frame,
+    _unit_rows, top_n_indices,
+)
+
+FLAT_MAX_ROWS = 10000
+FACTORIZE_MAX_ROWS = 5000
+
+
+def factorize_similarity(matrix, max_dim=256, energy=0.9999):
+    """Vectors F with F Fᵀ ≈ ``matrix`` from its top eigenpairs."""
+    w, v = np.linalg.eigh(np.asarray(matrix, dtype=np.float64))
+    order = np.argsort(w)[::-1]
+    w, v = np.clip(w[order], 0, None), v[:, order]
+    dim = int(np.searchsorted(np.cumsum(w) / w.sum(), energy)) + 1
+    dim = min(dim, max_dim, len(w))
+    return _unit_rows(v[:, :dim] * np.sqrt(w[:dim]))
+
+
+def store_vectors(store, max_dim=256):
+    """One unit-norm N × d array per component for the active listing."""
+    vectors = []
+    for c, name in enumerate(COMPONENTS):
+        if all(name in s.features for s in store.segments):
+            vectors.append(np.concatenate(
+                [s.features[name] for s in store.segments]))
+        elif len(store.names) <= FACTORIZE_MAX_ROWS:
+            dense = store.row_block(c, np.arange(len(store.names)))
+            vectors.append(factorize_similarity(dense, max_dim))
+        else:
+            raise ValueError(
+                f"{name}: no stored source vectors and {len(store.names)} "
+                f"rows is too many to factorise; rebuild the store with "
+                f"--features")
+    keep = np.setdiff1d(np.arange(len(store.names)), store.removed_ids)
+    return store.names[keep], [np.ascontiguousarray(v[keep]) for v in vectors]
+
+
+def make_index(vectors, kind='auto', nlist=None, hnsw_m=32):
+    n, d = vectors.shape
+    if kind == 'auto':
+        kind = 'flat' if n <= FLAT_MAX_ROWS else 'hnsw'
+    if kind == 'flat':
+        index = faiss.IndexFlatIP(d)
+    elif kind == 'ivf':
+        nlist = nlist or max(1, int(np.sqrt(n)))
+        index = faiss.IndexIVFFlat(faiss.IndexFlatIP(d), d, nlist,
+                                   faiss.METRIC_INNER_PRODUCT)
+        index.train(vectors)
+    elif kind == 'hnsw':
+        index = faiss.IndexHNSWFlat(d, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+    else:
+        raise ValueError(f"unknown index type {kind!r}")
+    index.add(vectors)
+    return index
+
+
+def set_search_effort(index, effort):
+    """Map one knob onto ``nprobe`` (IVF) or ``efSearch`` (HNSW)."""
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = effort
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = effort
+
+
+class FaissRecommender:
+    """Weighted top-N over one FAISS index per similarity component."""
+
+    def __init__(self, names, vectors, indexes):
+        self.names = pd.Index(names)
+        self.vectors = vectors
+        self.indexes = indexes
+
+    @classmethod
+    def build(cls, store, kind='auto', max_dim=256, **kwargs):
+        names, vectors = store_vectors(store, max_dim)
+        return cls(names, vectors,
+                   [make_index(v, kind, **kwargs) for v in vectors])
+
+    def save(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        for c, (v, index) in enumerate(zip(self.vectors, self.indexes)):
+            np.save(os.path.join(directory, f'vectors{c}.npy'), v)
+            faiss.write_index(index, os.path.join(directory, f'{c}.faiss'))
+        with open(os.path.join(directory, 'names.json'), 'w') as f:
+            json.dump(self.names.tolist(), f)
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, 'names.json')) as f:
+            names = json.load(f)
+        n = len(COMPONENTS)
+        vectors = [np.load(os.path.join(directory, f'vectors{c}.npy'),
+                           mmap_mode='r') for c in range(n)]
+        indexes = [faiss.read_index(os.path.join(directory, f'{c}.faiss'))
+                   for c in range(n)]
+        return cls(names, vectors, indexes)
+
+    def set_search_effort(self, effort):
+        for index in self.indexes:
+            set_search_effort(index, effort)
+
+    def recommend(self, property_name, top_n=10, weights=DEFAULT_WEIGHTS,
+                  pool=None, removed=()):
+        """Top-N matches rescored exactly, skipping ``removed`` names."""
+        i = self.names.get_loc(property_name)
+        pool = min(pool or max(4 * top_n, 50), len(self.names))
+        cand = set()
+        for w, v, index in zip(weights, self.vectors, self.indexes):
+            if w:
+                _, ids = index.search(np.asarray(v[i:i + 1]), pool)
+                cand.update(ids[0][ids[0] >= 0].tolist())
+        cand.discard(i)
+        cand = np.fromiter(sorted(cand), dtype=np.int64)
+
+        scores = np.zeros(len(cand))
+        for w, v in zip(weights, self.vectors):
+            scores += w * (np.asarray(v[cand]) @ np.asarray(v[i]))
+        gone = np.flatnonzero(self.names[cand].isin(removed))
+        best = top_n_indices(scores, top_n, gone)
+        return _result_frame(self.names[cand], best, scores)
+
+
+def recall_report(store, top_n=10, sample=100, weights=DEFAULT_WEIGHTS,
+                  configs=None, seed=0):
+    """Recall@top_n and mean latency of FAISS configs vs the dense engine."""
+    configs = configs or [('flat', None), ('ivf', 1), ('ivf', 4),
+                          ('ivf', 16), ('hnsw', 16), ('hnsw', 64)]
+    names = store.active_names()
+    rng = np.random.default_rng(seed)
+    queries = rng.choice(names, size=min(sample, len(names)), replace=False)
+
+    def timed(engine):
+        results, start = [], time.perf_counter()
+        for q in queries:
+            results.append(set(engine(q).PropertyName))
+        return results, (time.perf_counter() - start) / len(queries)
+
+    exact, exact_latency = timed(
+        lambda q: store.recommend(q, top_n, weights))
+    rows = [{'engine': 'dense (exact)', 'effort': None, 'recall': 1.0,
+             'latency_ms': exact_latency * 1e3}]
+    built = {}
+    for kind, effort in configs:
+        if kind not in built:
+            built[kind] = FaissRecommender.build(store, kind)
+        engine = built[kind]
+        engine.set_search_effort(effort)
+        found, latency = timed(lambda q: engine.recommend(q, top_n, weights))
+        recall = np.mean([len(a & b) / len(a) for a, b in zip(exact, found)])
+        rows.append({'engine': f'faiss {kind}', 'effort': effort,
+                     'recall': recall, 'latency_ms': latency * 1e3})
+    return pd.DataFrame(rows)
+
+
+def _open_store(path):
+    if os.path.isdir(path):
+        return SimilarityStore.open(path)
+    return SimilarityStore.from_pickle(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS Asset Matcher")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='build and save FAISS indexes')
+    build.add_argument('--store', default='recommender_data.pkl',
+                       help='store directory or recommender pickle')
+    build.add_argument('--index', default='auto',
+                       choices=['auto', 'flat', 'ivf', 'hnsw'])
+    build.add_argument('--out', default='recommender_faiss')
+    report = sub.add_parser('report', help='recall vs latency table')
+    report.add_argument('--store', default='recommender_data.pkl')
+    report.add_argument('--top-n', type=int, default=10)
+    report.add_argument('--sample', type=int, default=100)
+    report.add_argument('--out', help='optional CSV path for the table')
+    args = parser.parse_args()
+
+    store = _open_store(args.store)
+    if args.command == 'build':
+        engine = FaissRecommender.build(store, args.index)
+        engine.save(args.out)
+        print(f"{len(engine.names)} properties -> {args.out}")
+    else:
+        table = recall_report(store, args.top_n, args.sample)
+        print(table.to_string(index=False))
+        if args.out:
+            table.to_csv(args.out, index=False)
+
+
+if __name__ == '__main__':
+    main()
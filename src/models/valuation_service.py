@@ -0,0 +1,175 @@
+"""Headless valuation service with request micro-batching.
+
+Concurrent requests that arrive within ``max_wait_ms`` of each other are
+coalesced into one ``pipeline.predict`` call, so the ColumnTransformer and
+forest overhead is paid once per batch rather than once per user.
+
+Run it next to the Streamlit app::
+
+    python -m src.models.valuation_service --port 8502
+
+and point the Valuation Engine at it with
+``GARMANDI_VALUATION_URL=http://127.0.0.1:8502``.
+"""
+import argparse
+import json
+import math
+import pickle
+import queue
+import threading
+import time
+import urllib.request
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from src.models.predict_model import known_categories, predict_frame
+
+
+class MicroBatcher:
+    """Collects concurrent prediction requests into batched calls.
+
+    ``submit`` blocks the calling thread until its rows have been scored.
+    A single worker thread drains the queue: it waits for the first
+    request, then keeps accepting more until ``max_batch_size`` rows are
+    pending or ``max_wait_ms`` has passed, and scores them together.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = {'requests': 0, 'rows': 0, 'batches': 0}
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def submit(self, frame, timeout=None):
+        future = Future()
+        self._queue.put((frame, future))
+        return future.result(timeout)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch, rows
+
+    def _run(self):
+        while True:
+            batch, rows = self._collect()
+            self.stats['requests'] += len(batch)
+            self.stats['rows'] += rows
+            self.stats['batches'] += 1
+            try:
+                frame = pd.concat([f for f, _ in batch], ignore_index=True)
+                preds = self.predict_fn(frame)
+            except Exception:
+                # One bad request must not fail its neighbours: retry the
+                # batch item by item so only the offender gets the error.
+                self._run_individually(batch)
+                continue
+            start = 0
+            for f, future in batch:
+                future.set_result(preds[start:start + len(f)])
+                start += len(f)
+
+    def _run_individually(self, batch):
+        for frame, future in batch:
+            try:
+                future.set_result(self.predict_fn(frame))
+            except Exception as e:
+                future.set_exception(e)
+
+
+class ValuationServer(ThreadingHTTPServer):
+    # The stdlib default backlog of 5 resets connections under the very
+    # bursts micro-batching is meant to absorb.
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def make_handler(batcher):
+    class ValuationHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != '/health':
+                return self._send(404, {'error': 'not found'})
+            self._send(200, {'status': 'ok', **batcher.stats})
+
+        def do_POST(self):
+            if self.path != '/predict':
+                return self._send(404, {'error': 'not found'})
+            try:
+                length = int(self.headers.get('Content-Length', 0))
+                rows = json.loads(self.rfile.read(length))['rows']
+                preds = batcher.submit(pd.DataFrame(rows))
+            except Exception as e:
+                return self._send(400, {'error': str(e)})
+            self._send(200, {'predictions': [
+                None if math.isnan(p) else float(p) for p in preds
+            ]})
+
+        def _send(self, code, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ValuationHandler
+
+
+def predict_remote(url, rows, timeout=10.0):
+    """Client for ``/predict``; ``rows`` is a list of feature dicts."""
+    req = urllib.request.Request(
+        url.rstrip('/') + '/predict',
+        data=json.dumps({'rows': rows}).encode(),
+        headers={'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read())['predictions']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--model', default='pipelin.pkl')
+    parser.add_argument('--data', default='d.pkl',
+                        help='training frame used to reject unseen categories')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        pipeline = pickle.load(f)
+    with open(args.data, 'rb') as f:
+        categories = known_categories(pickle.load(f))
+
+    batcher = MicroBatcher(
+        lambda frame: predict_frame(pipeline, frame, categories),
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+    )
+    server = ValuationServer((args.host, args.port), make_handler(batcher))
+    print(f"Valuation service on http://{args.host}:{args.port}")
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""What-if sweeps: evaluate a whole price surface with one predict call."""
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from src.models.predict_model import (
+    FEATURE_COLUMNS, NUM_COLUMNS, PREDICTION_COLUMN, predict_frame,
+)
+
+
+def axis_values(df, column, start=None, stop=None, steps=25):
+    """Sweep values for ``column``.
+
+    Numeric columns get ``steps`` evenly spaced points in ``[start, stop]``
+    (defaulting to the observed range in ``df``); categoricals get every
+    value seen in ``df``.
+    """
+    if column in NUM_COLUMNS:
+        lo = df[column].min() if start is None else start
+        hi = df[column].max() if stop is None else stop
+        return np.linspace(lo, hi, steps)
+    return sorted(df[column].astype(str).unique())
+
+
+def build_grid(base, axes):
+    """Cartesian product of ``axes`` with every other feature from ``base``.
+
+    ``axes`` maps column name to the values to sweep; columns that are not
+    swept keep their value from the ``base`` record.
+    """
+    names = list(axes)
+    grid = pd.DataFrame(list(itertools.product(*axes.values())),
+                        columns=names)
+    for c in FEATURE_COLUMNS:
+        if c not in axes:
+            grid[c] = base[c]
+    return grid[FEATURE_COLUMNS]
+
+
+def sweep(pipeline, base, axes, categories=None):
+    """Score the full grid in a single batched ``pipeline.predict``."""
+    grid = build_grid(base, axes)
+    grid[PREDICTION_COLUMN] = predict_frame(pipeline, grid, categories)
+    return grid
+
+
+def to_surface(result, x, y):
+    """Pivot a two-axis sweep into a ``y`` × ``x`` price matrix."""
+    return result.pivot(index=y, columns=x, values=PREDICTION_COLUMN)
@@ -0,0 +1,128 @@
+"""Size-aware chart builders for the dashboards.
+
+Below ``max_points`` rows a chart is drawn from the raw points as before.
+Above it, the rows are aggregated on the server first: scatters become a
+2-D histogram (count, or the mean of a colour column, per cell) and
+violins become box plots drawn from precomputed quantiles. The payload
+sent to the browser is then bounded by the grid size, not by the listing.
+Maps have their own spatial structures under ``src.features``.
+"""
+import base64
+import io
+
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from PIL import Image
+
+MAX_POINTS = 5000
+GRID_BINS = 80
+
+
+def grid_aggregate(x, y, value=None, bins=GRID_BINS, range=None):
+    """Cell centres, counts and mean ``value`` on a ``bins`` × ``bins`` grid.
+
+    Returns ``(x_centres, y_centres, count, mean)`` with ``count`` and
+    ``mean`` shaped (len(y_centres), len(x_centres)); ``mean`` is ``None``
+    without ``value`` and NaN in empty cells.
+    """
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    ok = np.isfinite(x) & np.isfinite(y)
+    if value is not None:
+        value = np.asarray(value, dtype=float)
+        ok &= np.isfinite(value)
+    count, xe, ye = np.histogram2d(x[ok], y[ok], bins=bins, range=range)
+    mean = None
+    if value is not None:
+        total, _, _ = np.histogram2d(x[ok], y[ok], bins=[xe, ye],
+                                     weights=value[ok])
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = (total / count).T
+    return (xe[:-1] + xe[1:]) / 2, (ye[:-1] + ye[1:]) / 2, count.T, mean
+
+
+def _clipped_range(df, columns, tail=0.001):
+    bounds = df[columns].quantile([tail, 1 - tail])
+    return [tuple(bounds[c]) for c in columns]
+
+
+def scatter(df, x, y, color=None, max_points=MAX_POINTS, bins=GRID_BINS,
+            **kwargs):
+    """``px.scatter`` for small frames, a 2-D histogram heatmap above.
+
+    The binned grid spans the 0.1–99.9th percentiles of each axis so a
+    few extreme listings do not squash everything into one cell.
+    """
+    if len(df) <= max_points:
+        return px.scatter(df, x=x, y=y, color=color, **kwargs)
+    xc, yc, count, mean = grid_aggregate(
+        df[x], df[y], None if color is None else df[color], bins,
+        _clipped_range(df, [x, y]))
+    z = count if color is None else mean
+    z = np.where(count > 0, z, np.nan)
+    fig = go.Figure(go.Heatmap(
+        x=xc, y=yc, z=z, customdata=count,
+        colorscale=kwargs.get('color_continuous_scale'),
+        colorbar=dict(title=color or 'listings'),
+        hovertemplate=(f'{x}=%{{x:.3g}}<br>{y}=%{{y:.3g}}<br>'
+                       f'{color or "listings"}=%{{z:.3g}}<br>'
+                       'listings=%{customdata}<extra></extra>'),
+    ))
+    fig.update_layout(title=kwargs.get('title'), xaxis_title=x,
+                      yaxis_title=y)
+    return fig
+
+
+def group_quantiles(df, x, y):
+    """Box-plot statistics of ``y`` per ``x`` group (Tukey whiskers)."""
+    q = df.groupby(x)[y].quantile([0.25, 0.5, 0.75]).unstack()
+    q.columns = ['q1', 'median', 'q3']
+    iqr = q['q3'] - q['q1']
+    lo, hi = q['q1'] - 1.5 * iqr, q['q3'] + 1.5 * iqr
+    values = df[[x, y]].join(lo.rename('lo'), on=x).join(hi.rename('hi'), on=x)
+    inside = values[(values[y] >= values['lo']) & (values[y] <= values['hi'])]
+    q['lowerfence'] = inside.groupby(x)[y].min()
+    q['upperfence'] = inside.groupby(x)[y].max()
+    q['mean'] = df.groupby(x)[y].mean()
+    q['count'] = df.groupby(x)[y].count()
+    return q
+
+
+def distribution(df, x, y, max_points=MAX_POINTS, **kwargs):
+    """``px.violin`` for small frames, quantile box plots above."""
+    if len(df) <= max_points:
+        return px.violin(df, x=x, y=y, color=x, box=True, **kwargs)
+    q = group_quantiles(df, x, y)
+    fig = go.Figure()
+    for key, row in q.iterrows():
+        fig.add_trace(go.Box(
+            name=str(key), q1=[row['q1']], median=[row['median']],
+            q3=[row['q3']], lowerfence=[row['lowerfence']],
+            upperfence=[row['upperfence']], mean=[row['mean']],
+        ))
+    fig.update_layout(title=kwargs.get('title'), xaxis_title=x,
+                      yaxis_title=y, showlegend=False)
+    return fig
+
+
+def raster_image(z, colorscale=px.colors.sequential.Inferno, opacity=0.8):
+    """PNG data URI of grid ``z`` (row 0 = south), plus its value range.
+
+    Values are coloured along ``colorscale`` (a list of hex colours);
+    NaN cells are transparent. Use the URI as a mapbox ``image`` layer.
+    """
+    finite = np.isfinite(z)
+    lo, hi = (np.nanmin(z), np.nanmax(z)) if finite.any() else (0.0, 1.0)
+    t = np.clip((np.nan_to_num(z, nan=lo) - lo) / ((hi - lo) or 1.0), 0, 1)
+    stops = np.array([[int(c[i:i + 2], 16) for i in (1, 3, 5)]
+                      for c in colorscale], dtype=float)
+    positions = np.linspace(0, 1, len(stops))
+    rgba = np.empty(z.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(t, positions, stops[:, channel])
+    rgba[..., 3] = np.where(finite, int(255 * opacity), 0)
+    buffer = io.BytesIO()
+    Image.fromarray(np.flipud(rgba), 'RGBA').save(buffer, format='PNG')
+    uri = 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()).decode('ascii')
+    return uri, (float(lo), float(hi))
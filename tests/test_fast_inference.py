@@ -0,0 +1,109 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, OrdinalEncoder, StandardScaler
+
+from src.models.fast_inference import (
+    PARITY_TOLERANCE, check_parity, compile_pipeline,
+)
+from src.models.predict_model import CAT_COLUMNS, prepare_features
+
+NUM = ['bedRoom', 'bathroom', 'built_up_area', 'servant room', 'store room']
+
+
+@pytest.fixture(scope='module')
+def training():
+    with open('d.pkl', 'rb') as f:
+        df = pickle.load(f)
+    X, valid = prepare_features(df)
+    X = X[valid].reset_index(drop=True)
+    # Synthetic log-price: any target exercises the same encoders
+    y = (np.log1p(X['built_up_area']) + 0.1 * X['bedRoom']
+         + X['sector'].factorize()[0] * 1e-3)
+    return X, y
+
+
+def notebook_pipeline(regressor, unknown='error'):
+    # model-selection.ipynb: scaler, ordinal codes, one-hot sector/age
+    ordinal = (OrdinalEncoder() if unknown == 'error' else OrdinalEncoder(
+        handle_unknown='use_encoded_value', unknown_value=-1))
+    preprocessor = ColumnTransformer(
+        transformers=[
+            ('num', StandardScaler(), NUM),
+            ('cat', ordinal, CAT_COLUMNS),
+            ('cat1', OneHotEncoder(drop='first', sparse_output=False,
+                                   handle_unknown=unknown),
+             ['sector', 'agePossession'])
+        ],
+        remainder='passthrough'
+    )
+    return Pipeline([('preprocessor', preprocessor),
+                     ('regressor', regressor)])
+
+
+@pytest.mark.parametrize('regressor', [
+    LinearRegression(),
+    RandomForestRegressor(n_estimators=20, max_depth=8, random_state=0),
+])
+def test_notebook_recipe_parity(training, regressor):
+    X, y = training
+    pipeline = notebook_pipeline(regressor).fit(X, y)
+    compiled = compile_pipeline(pipeline, X.head(200))
+    assert compiled is not None
+    assert check_parity(pipeline, compiled, X) <= PARITY_TOLERANCE
+
+
+def test_unseen_categories(training):
+    X, y = training
+    pipeline = notebook_pipeline(LinearRegression(), 'ignore').fit(X, y)
+    compiled = compile_pipeline(pipeline, X.head(200))
+    unseen = X.head(50).copy()
+    unseen['sector'] = 'sector 999'
+    unseen.loc[::2, 'agePossession'] = 'not a category'
+    with pytest.warns(UserWarning):
+        expected = pipeline.predict(unseen)
+    actual = compiled.predict_records(unseen.to_dict('records'))
+    np.testing.assert_allclose(actual, expected, atol=PARITY_TOLERANCE)
+
+
+def test_unseen_categories_raise_when_encoder_does(training):
+    X, y = training
+    pipeline = notebook_pipeline(LinearRegression()).fit(X, y)
+    compiled = compile_pipeline(pipeline)
+    record = dict(X.iloc[0], sector='sector 999')
+    with pytest.raises(ValueError):
+        pipeline.predict(pd.DataFrame([record]))
+    with pytest.raises(ValueError):
+        compiled.predict_one(record)
+
+
+@pytest.mark.parametrize('step', [
+    ('num', StandardScaler(with_mean=False), NUM),
+    ('num', StandardScaler(with_std=False), NUM),
+    ('cat1', OneHotEncoder(min_frequency=5,
+                           handle_unknown='infrequent_if_exist'),
+     ['sector']),
+    ('cat1', OneHotEncoder(max_categories=10), ['sector']),
+    ('cat', OrdinalEncoder(min_frequency=5), ['sector']),
+])
+def test_unsupported_options_fall_back(training, step):
+    X, y = training
+    pipeline = Pipeline([
+        ('preprocessor', ColumnTransformer([step], remainder='drop')),
+        ('regressor', LinearRegression()),
+    ]).fit(X, y)
+    assert compile_pipeline(pipeline) is None
+
+
+def test_parity_failure_falls_back(training):
+    X, y = training
+    pipeline = notebook_pipeline(LinearRegression()).fit(X, y)
+    # A sample the pipeline cannot score (unseen category) is a failed check
+    sample = X.head(20).assign(sector='sector 999')
+    assert compile_pipeline(pipeline, sample) is None
@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from src.models.recommender import (
+    COMPONENTS, SimilarityStore, TopKIndex, load_recommender_pickle,
+)
+
+
+@pytest.fixture(scope='module')
+def data():
+    return load_recommender_pickle('recommender_data.pkl')
+
+
+@pytest.fixture(scope='module')
+def topk(data):
+    return TopKIndex.build(data, k=20)
+
+
+def test_topk_save_load_round_trip(topk, tmp_path):
+    path = tmp_path / 'topk.npz'
+    topk.save(path)
+    loaded = TopKIndex.load(path)
+    assert list(loaded.names) == list(topk.names)
+    np.testing.assert_array_equal(loaded.ids, topk.ids)
+    np.testing.assert_array_equal(loaded.scores, topk.scores)
+    name = topk.names[0]
+    assert loaded.recommend(name, 5).equals(topk.recommend(name, 5))
+
+
+@pytest.fixture
+def store(tmp_path):
+    SimilarityStore.from_pickle('recommender_data.pkl').save(tmp_path)
+    return SimilarityStore.open(tmp_path)
+
+
+def test_topk_matches_dense_store(data):
+    topk = TopKIndex.build(data, k=50)
+    store = SimilarityStore.from_pickle('recommender_data.pkl')
+    for name in store.names:
+        assert topk.recommend(name, 10).equals(store.recommend(name, 10))
+
+
+def test_topk_masks_removed(data, topk):
+    name = topk.names[0]
+    best = topk.recommend(name, 3)['PropertyName'].tolist()
+    result = topk.recommend(name, 3, removed={best[0]})['PropertyName']
+    assert best[0] not in set(result)
+    assert result.tolist()[:2] == best[1:]
+
+
+def copy_rows(store, i):
+    # Similarities of an exact duplicate of property ``i``, itself included
+    return {c: np.append(store.row(k, i), store.row(k, i)[i])[None, :]
+            for k, c in enumerate(COMPONENTS)}
+
+
+def test_add_properties_survives_reload(store, tmp_path):
+    source = store.names[0]
+    store.add_properties(['Twin Tower'], rows=copy_rows(store, 0))
+    reopened = SimilarityStore.open(tmp_path)
+    assert 'Twin Tower' in reopened.active_names()
+    assert reopened.recommend('Twin Tower', 1)['PropertyName'][0] == source
+    assert 'Twin Tower' in set(reopened.recommend(source, 1)['PropertyName'])
+
+
+def test_remove_properties_survives_reload(store, tmp_path):
+    name = store.names[0]
+    neighbour = store.recommend(name, 1)['PropertyName'][0]
+    store.remove_properties([neighbour])
+    reopened = SimilarityStore.open(tmp_path)
+    assert neighbour not in reopened.active_names()
+    assert neighbour not in set(reopened.recommend(name, 20)['PropertyName'])
+    with pytest.raises(KeyError):
+        reopened.recommend(neighbour)
+
+
+def test_compact_folds_deltas_and_removals(store, tmp_path):
+    store.add_properties(['Twin Tower'], rows=copy_rows(store, 0))
+    store.remove_properties([store.names[1]])
+    compacted = store.compact()
+    assert list(compacted.names) == list(store.active_names())
+    for name in ['Twin Tower', store.names[0]]:
+        assert compacted.recommend(name, 10).equals(
+            store.recommend(name, 10))
+
+
+def test_relist_after_removal(store, tmp_path):
+    name = store.names[1]
+    rows = copy_rows(store, 0)
+    store.remove_properties([name])
+    store.add_properties([name], rows=rows)
+    reopened = SimilarityStore.open(tmp_path)
+    assert list(reopened.active_names()).count(name) == 1
+    assert reopened.recommend(name, 1)['PropertyName'][0] == store.names[0]
+    reopened.remove_properties([name])
+    assert name not in SimilarityStore.open(tmp_path).active_names()
+    assert list(reopened.compact().names) == list(reopened.active_names())